@@ -4,31 +4,169 @@ import os
 import glob
 import soundfile as sf
 import functools
+import collections
+import concurrent.futures
 import musdb
 import warnings
 import pandas as pd
 from .aggregate import TrackStore, MethodStore, EvalStore, json2df
-from . import metrics
+from . import cheap_metrics
+from . import metrics as bsseval
+from .metrics import METRICS
+from .cache import ReferenceCache, ResultCache, StemCache, _SharedCorrelations
+from .audio import AudioSources, load_audio, load_estimates_dir
+from .sharding import shard_tracks
 
 
-def _load_track_estimates(track, estimates_dir, output_dir, ext="wav"):
+def _load_track_estimates(
+    track,
+    estimates_dir,
+    output_dir,
+    ext="wav",
+    mmap=False,
+    sidecar=False,
+    workspace=None,
+    metrics=METRICS,
+    resolutions=None,
+    result_cache=None,
+    stem_cache=None,
+    reference_cache=None,
+):
     """load estimates from disk instead of processing"""
-    user_results = {}
     track_estimate_dir = os.path.join(estimates_dir, track.subset, track.name)
-    for target in glob.glob(track_estimate_dir + "/*." + ext):
-        target_name = op.splitext(os.path.basename(target))[0]
-        try:
-            target_audio, _ = sf.read(target, always_2d=True)
-            user_results[target_name] = target_audio
-        except RuntimeError:
-            pass
+    user_results, _ = load_estimates_dir(
+        track_estimate_dir, ext=ext, mmap=mmap, sidecar=sidecar
+    )
 
     if user_results:
-        eval_mus_track(track, user_results, output_dir=output_dir)
+        eval_mus_track(
+            track,
+            user_results,
+            output_dir=output_dir,
+            workspace=workspace,
+            metrics=metrics,
+            resolutions=resolutions,
+            result_cache=result_cache,
+            stem_cache=stem_cache,
+            reference_cache=reference_cache,
+        )
 
     return None
 
 
+def _decode_track(
+    track, estimates_dir, ext="wav", mmap=False, sidecar=False, stem_cache=None
+):
+    """estimates of a track loaded from disk, along with the decoded audio of
+    the reference targets that they estimate"""
+    track_estimate_dir = os.path.join(estimates_dir, track.subset, track.name)
+    user_results, _ = load_estimates_dir(
+        track_estimate_dir, ext=ext, mmap=mmap, sidecar=sidecar
+    )
+    references = {
+        target: _target_audio(track, target, stem_cache)
+        for target in user_results
+        if target in track.targets
+    }
+    return user_results, references
+
+
+def _target_audio(track, target, stem_cache=None):
+    """decoded audio of a reference target, read from the stem cache if any"""
+    if stem_cache is None:
+        return track.targets[target].audio
+    if isinstance(stem_cache, str):
+        stem_cache = StemCache(stem_cache)
+    return stem_cache.audio(track, target)
+
+
+def _eval_mus_pipeline(
+    tracks,
+    estimates_dir,
+    output_dir,
+    prefetch=1,
+    ext="wav",
+    mmap=False,
+    sidecar=False,
+    resolutions=None,
+    stem_cache=None,
+    **kwargs
+):
+    """Evaluates the tracks in turn, the next `prefetch` tracks being decoded
+    by a background thread while a track is evaluated, and the scores being
+    validated and saved by another one. The failed tracks are reported by
+    warnings, see `eval_mus_dir`."""
+    reader = concurrent.futures.ThreadPoolExecutor(1)
+    writer = concurrent.futures.ThreadPoolExecutor(1)
+    with reader, writer:
+        tracks = iter(tracks)
+        decoding = collections.deque()
+        writing = collections.deque()
+
+        def decode_next():
+            track = next(tracks, None)
+            if track is not None:
+                decoding.append(
+                    (
+                        track,
+                        reader.submit(
+                            _decode_track,
+                            track,
+                            estimates_dir,
+                            ext,
+                            mmap,
+                            sidecar,
+                            stem_cache,
+                        ),
+                    )
+                )
+
+        def wait_written():
+            track, written = writing.popleft()
+            try:
+                written.result()
+            except Exception as e:
+                _warn_track_failed(track, e)
+
+        for _ in range(prefetch):
+            decode_next()
+        while decoding:
+            track, decoded = decoding.popleft()
+            decode_next()
+            try:
+                user_results, references = decoded.result()
+                if not user_results:
+                    continue
+                stores = eval_mus_track(
+                    track,
+                    user_results,
+                    references=references,
+                    resolutions=resolutions,
+                    **kwargs
+                )
+            except Exception as e:
+                _warn_track_failed(track, e)
+                continue
+            if output_dir:
+                writing.append(
+                    (
+                        track,
+                        writer.submit(
+                            _save_track_scores,
+                            track,
+                            stores if resolutions is not None else [stores],
+                            output_dir,
+                            resolutions is not None,
+                        ),
+                    )
+                )
+                # the scores of at most prefetch tracks are pending
+                while len(writing) > prefetch:
+                    wait_written()
+        while writing:
+            wait_written()
+
+
 def eval_dir(
     reference_dir,
     estimates_dir,
@@ -36,6 +174,17 @@ def eval_dir(
     mode="v4",
     win=1.0,
     hop=1.0,
+    dtype=np.float64,
+    workers=1,
+    reference_cache=None,
+    block_size=None,
+    mmap=False,
+    sidecar=False,
+    workspace=None,
+    metrics=METRICS,
+    resolutions=None,
+    threads=1,
+    result_cache=None,
 ):
     """Compute bss_eval metrics for two given directories assuming file
     names are identical for both, reference source and estimates.
@@ -53,23 +202,68 @@ def eval_dir(
         bsseval version number. Defaults to 'v4'.
     win : int
         window size in
+    dtype : np.dtype
+        floating point precision used to load and evaluate the audio, see
+        `evaluate`. Defaults to `np.float64`.
+    workers : int
+        number of threads of the Fourier transforms, see `evaluate`.
+    threads : int
+        number of threads evaluating the sources in parallel, see `evaluate`.
+    reference_cache : ReferenceCache or str
+        cache of the reference side computations, see `evaluate`.
+    block_size : int
+        if not `None`, the audio files are not loaded into memory but read
+        by blocks of `block_size` samples, see `evaluate`.
+    mmap : bool
+        memory-map the uncompressed floating point WAV files as read-only
+        arrays instead of decoding them, defaults to `False`.
+    sidecar : bool
+        store the decoded estimates into a `.npy` sidecar file of
+        `estimates_dir` on the first evaluation, that is then memory-mapped
+        by the next ones. Defaults to `False`.
+    workspace : Workspace
+        buffers of the temporaries, see `evaluate`.
+    metrics : tuple(str)
+        names of the metrics to compute and store, among the BSS Eval ones of
+        `evaluate` and the cheap ones of `museval.cheap_metrics`, which are
+        computed from the same signals. Defaults to all the BSS Eval metrics.
+    resolutions : List((float, float))
+        if not `None`, the track is evaluated with each of these window and
+        hop sizes in seconds instead of `win` and `hop`, sharing the
+        computations of the distortion filters, see
+        `evaluate_multiresolution`. A window of `np.inf` evaluates the whole
+        track. Defaults to `None`.
+    result_cache : ResultCache or str
+        on-disk cache, or path to the directory of a cache, of the scores.
+        When the same audio files were already evaluated with the same
+        parameters, the stored scores are returned instead of evaluating
+        them again. Defaults to `None`, meaning no caching.
 
     Returns
     -------
-    scores : TrackStore
-        scores object that holds the framewise and global evaluation scores.
+    scores : TrackStore or List(TrackStore)
+        scores object that holds the framewise and global evaluation scores,
+        or the scores of each resolution if `resolutions` is given.
     """
 
     reference = []
     estimates = []
 
-    data = TrackStore(win=win, hop=hop, track_name=os.path.basename(reference_dir))
+    framings = [(win, hop)] if resolutions is None else list(resolutions)
+    stores = [
+        TrackStore(win=w, hop=h, track_name=os.path.basename(reference_dir))
+        for (w, h) in framings
+    ]
 
     global_rate = None
     reference_glob = os.path.join(reference_dir, "*.wav")
     # Load in each reference file in the supplied dir
     for reference_file in glob.glob(reference_glob):
-        ref_audio, rate = sf.read(reference_file, always_2d=True)
+        if block_size is None:
+            ref_audio, rate = load_audio(reference_file, mmap=mmap, dtype=dtype)
+        else:
+            # the file is read by blocks during the evaluation
+            ref_audio, rate = reference_file, sf.info(reference_file).samplerate
         # Make sure fs is the same for all files
         assert global_rate is None or rate == global_rate
         global_rate = rate
@@ -80,34 +274,87 @@ def eval_dir(
 
     estimated_glob = os.path.join(estimates_dir, "*.wav")
     targets = []
+    if sidecar:
+        # decoded estimates, memory-mapped from the sidecar of the folder
+        decoded, decoded_rate = load_estimates_dir(
+            estimates_dir, mmap=mmap, sidecar=True
+        )
     for estimated_file in glob.glob(estimated_glob):
         targets.append(os.path.basename(estimated_file))
-        ref_audio, rate = sf.read(estimated_file, always_2d=True)
+        target_name = op.splitext(targets[-1])[0]
+        if sidecar and target_name in decoded:
+            ref_audio, rate = decoded[target_name], decoded_rate
+        elif block_size is None:
+            ref_audio, rate = load_audio(estimated_file, mmap=mmap, dtype=dtype)
+        else:
+            ref_audio, rate = estimated_file, sf.info(estimated_file).samplerate
         assert global_rate is None or rate == global_rate
         global_rate = rate
         estimates.append(ref_audio)
 
-    SDR, ISR, SIR, SAR = evaluate(
+    if isinstance(result_cache, str):
+        result_cache = ResultCache(result_cache)
+    if result_cache is not None:
+        result_key = result_cache.key(
+            reference,
+            estimates,
+            targets=targets,
+            mode=mode,
+            resolutions=framings,
+            dtype=np.dtype(dtype).str,
+            metrics=tuple(metrics),
+        )
+        cached = result_cache.load(result_key, os.path.basename(reference_dir))
+        if cached is not None:
+            return cached[0] if resolutions is None else cached
+
+    if block_size is not None:
+        reference = AudioSources(reference, dtype=dtype, mmap=mmap)
+        estimates = AudioSources(
+            estimates, length=reference.shape[1], dtype=dtype, mmap=mmap
+        )
+
+    scores = _evaluate_scores(
         reference,
         estimates,
-        win=int(win * global_rate),
-        hop=int(hop * global_rate),
+        _resolution_samples(framings, global_rate),
         mode=mode,
+        dtype=dtype,
+        workers=workers,
+        threads=threads,
+        reference_cache=reference_cache,
+        block_size=block_size,
+        workspace=workspace,
+        metrics=metrics,
     )
-    for i, target in enumerate(targets):
-        values = {
-            "SDR": SDR[i].tolist(),
-            "SIR": SIR[i].tolist(),
-            "ISR": ISR[i].tolist(),
-            "SAR": SAR[i].tolist(),
-        }
-
-        data.add_target(target_name=target, values=values)
+    for data, values in zip(stores, scores):
+        for i, target in enumerate(targets):
+            data.add_target(
+                target_name=target,
+                values={metric: score[i].tolist() for metric, score in values.items()},
+            )
+    if result_cache is not None:
+        result_cache.save(result_key, stores)
 
-    return data
+    return stores[0] if resolutions is None else stores
 
 
-def eval_mus_dir(dataset, estimates_dir, output_dir=None, ext="wav"):
+def eval_mus_dir(
+    dataset,
+    estimates_dir,
+    output_dir=None,
+    ext="wav",
+    mmap=False,
+    sidecar=False,
+    metrics=METRICS,
+    resolutions=None,
+    n_jobs=1,
+    shard=None,
+    result_cache=None,
+    prefetch=1,
+    stem_cache=None,
+    reference_cache=None,
+):
     """Run evaluation of musdb estimate dir
 
     Parameters
@@ -120,21 +367,125 @@ def eval_mus_dir(dataset, estimates_dir, output_dir=None, ext="wav"):
         Output folder where evaluation json files are stored.
     ext : str
         estimate file extension, defaults to `wav`
+    mmap : bool
+        memory-map the uncompressed floating point estimates files as
+        read-only arrays instead of decoding them, defaults to `False`.
+    sidecar : bool
+        store the decoded estimates of each track into a `.npy` sidecar file
+        of its folder on the first evaluation, that is then memory-mapped by
+        the next ones. Defaults to `False`.
+    metrics : tuple(str)
+        names of the metrics to compute and store, among the BSS Eval ones of
+        `evaluate` and the cheap ones of `museval.cheap_metrics`, which are
+        computed from the same signals. Defaults to all the BSS Eval metrics.
+    resolutions : List((float, float))
+        window and hop sizes in seconds of several evaluations sharing the
+        computations of the distortion filters, whose results are stored into
+        a subfolder of `output_dir` for each resolution, see
+        `eval_mus_track`. Defaults to `None`, evaluating 1 second frames.
+    n_jobs : int
+        number of processes evaluating the tracks in parallel, each of them
+        writing the json files of its tracks. `-1` uses all the cores.
+        Defaults to `1`, evaluating the tracks in turn. Whatever the number
+        of processes, a failed track is reported by a warning without
+        stopping the other ones.
+    shard : (int, int)
+        if not `None`, the `(index, count)` of the shard of the tracks to
+        evaluate, see `shard_tracks`, the results of all the shards being
+        merged with `museval.sharding.merge_eval_dirs`. Defaults to `None`,
+        evaluating all the tracks.
+    result_cache : ResultCache or str
+        cache of the scores, the tracks whose estimates were already
+        evaluated being skipped, see `eval_mus_track`. Defaults to `None`.
+    prefetch : int
+        number of tracks decoded in advance by a background thread while a
+        track is evaluated in turn, the scores being validated and saved by
+        another one. `0` decodes, evaluates and saves each track in turn.
+        Defaults to `1`.
+    stem_cache : StemCache or str
+        cache of the decoded reference targets, see `eval_mus_track`.
+        Defaults to `None`.
+    reference_cache : ReferenceCache or str
+        cache of the reference side computations, shared by the evaluations
+        of the same references by other methods, see `evaluate`. Defaults to
+        `None`.
     """
     # create a new musdb instance for estimates with the same file structure
     est = musdb.DB(root=estimates_dir, is_wav=True)
     # get a list of track names
     tracks_to_be_estimated = [t.name for t in est.tracks]
+    tracks = [track for track in dataset if track.name in tracks_to_be_estimated]
+    if shard is not None:
+        tracks = shard_tracks(tracks, *shard)
 
-    for track in dataset:
-        if track.name not in tracks_to_be_estimated:
-            continue
-        _load_track_estimates(
-            track=track, estimates_dir=estimates_dir, output_dir=output_dir
+    kwargs = dict(
+        estimates_dir=estimates_dir,
+        output_dir=output_dir,
+        ext=ext,
+        mmap=mmap,
+        sidecar=sidecar,
+        metrics=metrics,
+        resolutions=resolutions,
+        result_cache=result_cache,
+        stem_cache=stem_cache,
+        reference_cache=reference_cache,
+    )
+    if n_jobs < 0:
+        n_jobs = max(os.cpu_count() + 1 + n_jobs, 1)
+    if n_jobs == 1 and prefetch > 0:
+        # the buffers of the evaluation are reused from one track to the next
+        _eval_mus_pipeline(
+            tracks, prefetch=prefetch, workspace=bsseval.Workspace(), **kwargs
         )
+        return
+    if n_jobs == 1:
+        workspace = bsseval.Workspace()
+        for track in tracks:
+            try:
+                _load_track_estimates(track=track, workspace=workspace, **kwargs)
+            except Exception as e:
+                _warn_track_failed(track, e)
+        return
+
+    # each process evaluates whole tracks with its own buffers
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = {
+            executor.submit(_load_track_estimates, track, **kwargs): track
+            for track in tracks
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                _warn_track_failed(futures[future], e)
+
+
+def _warn_track_failed(track, error):
+    """reports a track whose evaluation failed, the other tracks of
+    `eval_mus_dir` being still evaluated"""
+    warnings.warn(
+        UserWarning("Evaluation of track {} failed: {!r}".format(track.name, error))
+    )
 
 
-def eval_mus_track(track, user_estimates, output_dir=None, mode="v4", win=1.0, hop=1.0):
+def eval_mus_track(
+    track,
+    user_estimates,
+    output_dir=None,
+    mode="v4",
+    win=1.0,
+    hop=1.0,
+    dtype=np.float64,
+    workers=1,
+    reference_cache=None,
+    workspace=None,
+    metrics=METRICS,
+    resolutions=None,
+    threads=1,
+    result_cache=None,
+    references=None,
+    stem_cache=None,
+):
     """Compute all bss_eval metrics for the musdb track and estimated signals,
     given by a `user_estimates` dict.
 
@@ -151,16 +502,50 @@ def eval_mus_track(track, user_estimates, output_dir=None, mode="v4", win=1.0, h
         bsseval version number. Defaults to 'v4'.
     win : int
         window size in
+    dtype : np.dtype
+        floating point precision of the evaluation, see `evaluate`. Defaults
+        to `np.float64`.
+    workers : int
+        number of threads of the Fourier transforms, see `evaluate`.
+    threads : int
+        number of threads evaluating the sources in parallel, see `evaluate`.
+    reference_cache : ReferenceCache or str
+        cache of the reference side computations, see `evaluate`.
+    workspace : Workspace
+        buffers of the temporaries, see `evaluate`.
+    metrics : tuple(str)
+        names of the metrics to compute and store, among the BSS Eval ones of
+        `evaluate` and the cheap ones of `museval.cheap_metrics`, which are
+        computed from the same signals. Defaults to all the BSS Eval metrics.
+    resolutions : List((float, float))
+        if not `None`, the track is evaluated with each of these window and
+        hop sizes in seconds instead of `win` and `hop`, sharing the
+        computations of the distortion filters, see
+        `evaluate_multiresolution`. A window of `np.inf` evaluates the whole
+        track. The results of each resolution are saved into a subfolder of
+        `output_dir`, such as `win1_hop1`. Defaults to `None`.
+    result_cache : ResultCache or str
+        on-disk cache, or path to the directory of a cache, of the scores,
+        keyed by a hash of the reference and estimated audio and of the
+        evaluation parameters. Cached scores are returned, and still saved to
+        `output_dir`, without evaluating the track. Defaults to `None`,
+        meaning no caching.
+    references : Dict
+        already decoded audio of the targets of the track by name, the other
+        targets being decoded from `track`. Defaults to `None`.
+    stem_cache : StemCache or str
+        on-disk cache, or path to the directory of a cache, of the decoded
+        audio of the reference targets, which is memory-mapped instead of
+        decoding the stems again as long as they are unchanged. Defaults to
+        `None`, meaning that the targets are decoded.
 
     Returns
     -------
-    scores : TrackStore
-        scores object that holds the framewise and global evaluation scores.
+    scores : TrackStore or List(TrackStore)
+        scores object that holds the framewise and global evaluation scores,
+        or the scores of each resolution if `resolutions` is given.
     """
 
-    audio_estimates = []
-    audio_reference = []
-
     # make sure to always build the list in the same order
     # therefore track.targets is an OrderedDict
     eval_targets = []  # save the list of target names to be evaluated
@@ -175,7 +560,90 @@ def eval_mus_track(track, user_estimates, output_dir=None, mode="v4", win=1.0, h
         # append this target name to the list of target to evaluate
         eval_targets.append(key)
 
-    data = TrackStore(win=win, hop=hop, track_name=track.name)
+    framings = [(win, hop)] if resolutions is None else list(resolutions)
+    # the references are decoded once
+    references = {
+        target: (
+            references[target]
+            if references is not None and target in references
+            else _target_audio(track, target, stem_cache)
+        )
+        for target in eval_targets
+    }
+
+    if isinstance(result_cache, str):
+        result_cache = ResultCache(result_cache)
+    stores = None
+    if result_cache is not None:
+        result_key = result_cache.key(
+            [references[target] for target in eval_targets],
+            [user_estimates[target] for target in eval_targets],
+            targets=eval_targets,
+            mode=mode,
+            resolutions=framings,
+            dtype=np.dtype(dtype).str,
+            metrics=tuple(metrics),
+        )
+        stores = result_cache.load(result_key, track.name)
+    if stores is None:
+        stores = _eval_mus_track_scores(
+            track,
+            user_estimates,
+            references,
+            eval_targets,
+            framings,
+            mode=mode,
+            dtype=dtype,
+            workers=workers,
+            threads=threads,
+            reference_cache=reference_cache,
+            workspace=workspace,
+            metrics=metrics,
+        )
+        if result_cache is not None:
+            result_cache.save(result_key, stores)
+
+    if output_dir:
+        _save_track_scores(track, stores, output_dir, resolutions is not None)
+
+    return stores[0] if resolutions is None else stores
+
+
+def _save_track_scores(track, stores, output_dir, subfolders=False):
+    """validates the scores of each resolution of a track and saves them as
+    json files of output_dir, into a subfolder for each resolution if
+    subfolders is set"""
+    for data in stores:
+        # validate against the schema
+        data.validate()
+
+        try:
+            subset_path = op.join(output_dir, track.subset)
+            if subfolders:
+                subset_path = op.join(
+                    output_dir, _resolution_name(data.win, data.hop), track.subset
+                )
+
+            # the tracks of a process pool may create it concurrently
+            os.makedirs(subset_path, exist_ok=True)
+
+            with open(op.join(subset_path, track.name) + ".json", "w+") as f:
+                f.write(data.json)
+
+        except IOError:
+            pass
+
+
+def _eval_mus_track_scores(
+    track, user_estimates, references, eval_targets, framings, **kwargs
+):
+    """scores of each framing of `eval_mus_track`, given the decoded
+    references of the evaluated targets"""
+    eval_targets = list(eval_targets)
+    audio_estimates = []
+    audio_reference = []
+
+    stores = [TrackStore(win=w, hop=h, track_name=track.name) for (w, h) in framings]
 
     # check if vocals and accompaniment is among the targets
     has_acc = all(x in eval_targets for x in ["vocals", "accompaniment"])
@@ -184,33 +652,42 @@ def eval_mus_track(track, user_estimates, output_dir=None, mode="v4", win=1.0, h
         # the voc/acc scenario will be evaluated separately
         eval_targets.remove("accompaniment")
 
+    mixing = None
+    if has_acc and len(eval_targets) >= 2 and kwargs.get("mode", "v4") == "v4":
+        # the references correlations of the voc/acc scenario are derived
+        # from those of the other targets when they are mixtures of them
+        mixing = _target_mixing(track, ["vocals", "accompaniment"], eval_targets)
+    if mixing is not None:
+        reference_cache = kwargs.get("reference_cache")
+        if isinstance(reference_cache, str):
+            reference_cache = ReferenceCache(reference_cache)
+        kwargs["reference_cache"] = _SharedCorrelations(reference_cache)
+
     if len(eval_targets) >= 2:
         # compute evaluation of remaining targets
         for target in eval_targets:
             audio_estimates.append(user_estimates[target])
-            audio_reference.append(track.targets[target].audio)
+            audio_reference.append(references[target])
 
-        SDR, ISR, SIR, SAR = evaluate(
+        scores = _evaluate_scores(
             audio_reference,
             audio_estimates,
-            win=int(win * track.rate),
-            hop=int(hop * track.rate),
-            mode=mode,
+            _resolution_samples(framings, track.rate),
+            **kwargs
         )
 
         # iterate over all evaluation results except for vocals
-        for i, target in enumerate(eval_targets):
-            if target == "vocals" and has_acc:
-                continue
-
-            values = {
-                "SDR": SDR[i].tolist(),
-                "SIR": SIR[i].tolist(),
-                "ISR": ISR[i].tolist(),
-                "SAR": SAR[i].tolist(),
-            }
+        for data, values in zip(stores, scores):
+            for i, target in enumerate(eval_targets):
+                if target == "vocals" and has_acc:
+                    continue
 
-            data.add_target(target_name=target, values=values)
+                data.add_target(
+                    target_name=target,
+                    values={
+                        metric: score[i].tolist() for metric, score in values.items()
+                    },
+                )
     elif not has_acc:
         warnings.warn(
             UserWarning(
@@ -228,44 +705,53 @@ def eval_mus_track(track, user_estimates, output_dir=None, mode="v4", win=1.0, h
 
         for target in eval_targets:
             audio_estimates.append(user_estimates[target])
-            audio_reference.append(track.targets[target].audio)
+            audio_reference.append(references[target])
 
-        SDR, ISR, SIR, SAR = evaluate(
+        if mixing is not None:
+            kwargs["reference_cache"].mix(mixing)
+        scores = _evaluate_scores(
             audio_reference,
             audio_estimates,
-            win=int(win * track.rate),
-            hop=int(hop * track.rate),
-            mode=mode,
+            _resolution_samples(framings, track.rate),
+            **kwargs
         )
 
         # iterate over all targets
-        for i, target in enumerate(eval_targets):
-            values = {
-                "SDR": SDR[i].tolist(),
-                "SIR": SIR[i].tolist(),
-                "ISR": ISR[i].tolist(),
-                "SAR": SAR[i].tolist(),
-            }
-
-            data.add_target(target_name=target, values=values)
-
-    if output_dir:
-        # validate against the schema
-        data.validate()
-
-        try:
-            subset_path = op.join(output_dir, track.subset)
+        for data, values in zip(stores, scores):
+            for i, target in enumerate(eval_targets):
+                data.add_target(
+                    target_name=target,
+                    values={
+                        metric: score[i].tolist() for metric, score in values.items()
+                    },
+                )
 
-            if not op.exists(subset_path):
-                os.makedirs(subset_path)
+    return stores
 
-            with open(op.join(subset_path, track.name) + ".json", "w+") as f:
-                f.write(data.json)
 
-        except IOError:
-            pass
+def _target_mixing(track, targets, sources):
+    """matrix of the `targets` of the track as linear combinations of the
+    `sources` targets, each made of a single musdb source, `None` if some
+    targets are not mixtures of those"""
+    gains = {}
+    for j, name in enumerate(sources):
+        target_sources = getattr(track.targets[name], "sources", None)
+        if not target_sources or len(target_sources) != 1:
+            return None
+        if not target_sources[0].gain:
+            return None
+        gains[target_sources[0].name] = (j, target_sources[0].gain)
 
-    return data
+    mixing = np.zeros((len(targets), len(sources)))
+    for i, name in enumerate(targets):
+        for source in getattr(track.targets[name], "sources", None) or []:
+            if source.name not in gains:
+                return None
+            (j, gain) = gains[source.name]
+            mixing[i, j] += source.gain / gain
+    if not np.all(np.any(mixing, axis=1)):
+        return None
+    return mixing
 
 
 def pad_or_truncate(audio_reference, audio_estimates):
@@ -303,7 +789,19 @@ def pad_or_truncate(audio_reference, audio_estimates):
 
 
 def evaluate(
-    references, estimates, win=1 * 44100, hop=1 * 44100, mode="v4", padding=True
+    references,
+    estimates,
+    win=1 * 44100,
+    hop=1 * 44100,
+    mode="v4",
+    padding=True,
+    dtype=np.float64,
+    workers=1,
+    reference_cache=None,
+    block_size=None,
+    workspace=None,
+    metrics=METRICS,
+    threads=1,
 ):
     """BSS_EVAL images evaluation using metrics module
 
@@ -319,6 +817,40 @@ def evaluate(
         hop size in samples, defaults to 44100 (no overlap)
     mode : str
         BSSEval version, default to `v4`
+    dtype : np.dtype
+        floating point precision of the audio and of the computations,
+        defaults to `np.float64`. `np.float32` keeps the signals, their
+        spectra and projections in single precision, which lowers the memory
+        footprint, see `museval.metrics.bss_eval`. See `precision_deviation`
+        to check the deviation of the scores.
+    workers : int
+        maximum number of threads used by the Fourier transforms of one
+        evaluation, defaults to 1. `-1` uses all the cores.
+    threads : int
+        number of threads evaluating the sources of the track in parallel,
+        such as their distortion filters and projections, defaults to 1. See
+        `museval.metrics.bss_eval`.
+    reference_cache : ReferenceCache or str
+        on-disk cache, or path to the directory of a cache, of the references
+        correlations. When the references were already evaluated with the
+        same settings, their correlations are memory-mapped from the cache
+        instead of being computed again. Only used in `v4` mode. Defaults to
+        `None`, meaning no caching.
+    block_size : int
+        if not `None`, the references and estimates are read by blocks of
+        `block_size` samples instead of being loaded into memory, which
+        bounds the memory footprint of the evaluation. They should then have
+        the same shape and support slicing along the samples, as
+        memory-mapped arrays or `AudioSources`. Defaults to `None`.
+    workspace : Workspace
+        buffers of the temporaries of the evaluation, that can be shared by
+        the evaluations of successive tracks to reuse them. Defaults to
+        `None`, allocating them for this evaluation only.
+    metrics : tuple(str)
+        names of the metrics to compute among `SDR`, `ISR`, `SIR` and `SAR`,
+        the others being returned as `np.nan`. Only the computations needed
+        by these metrics are done, e.g. `("SDR",)` does not estimate any
+        distortion filters. Defaults to all the metrics.
     Returns
     -------
     SDR : np.ndarray, shape=(nsrc,)
@@ -331,20 +863,240 @@ def evaluate(
         vector of Sources to Artifacts Ratios (SAR)
     """
 
-    estimates = np.array(estimates)
-    references = np.array(references)
+    return evaluate_multiresolution(
+        references,
+        estimates,
+        resolutions=[(win, hop)],
+        mode=mode,
+        padding=padding,
+        dtype=dtype,
+        workers=workers,
+        threads=threads,
+        reference_cache=reference_cache,
+        block_size=block_size,
+        workspace=workspace,
+        metrics=metrics,
+    )[0]
+
+
+def evaluate_multiresolution(
+    references,
+    estimates,
+    resolutions=((1 * 44100, 1 * 44100),),
+    mode="v4",
+    padding=True,
+    dtype=np.float64,
+    workers=1,
+    reference_cache=None,
+    block_size=None,
+    workspace=None,
+    metrics=METRICS,
+    threads=1,
+):
+    """`evaluate` with several window and hop sizes at once
+
+    In `v4` mode, the distortion filters and the projections of the signals
+    are computed once and shared by all the resolutions, see
+    `museval.metrics.bss_eval_multiresolution`. When the signals are read by
+    blocks, each resolution is evaluated in turn.
+
+    Parameters
+    ----------
+    references : np.ndarray, shape=(nsrc, nsampl, nchan)
+        array containing true reference sources
+    estimates : np.ndarray, shape=(nsrc, nsampl, nchan)
+        array containing estimated sources
+    resolutions : List((int, int))
+        window and hop sizes in samples of each resolution, a window of
+        `np.inf` evaluating the whole signals. Defaults to 44100 for both.
+    mode, padding, dtype, workers, reference_cache, block_size
+        see `evaluate`
+    workspace, metrics, threads
+        see `evaluate`
+
+    Returns
+    -------
+    scores : List((SDR, ISR, SIR, SAR))
+        the scores of `evaluate` for each resolution
+    """
+
+    if block_size is not None:
+        # the sources are read by blocks during the evaluation
+        scores = []
+        for win, hop in resolutions:
+            SDR, ISR, SIR, SAR, _ = bsseval.bss_eval_streaming(
+                references,
+                estimates,
+                window=win,
+                hop=hop,
+                compute_permutation=False,
+                framewise_filters=(mode == "v3"),
+                bsseval_sources_version=False,
+                block_size=block_size,
+                dtype=dtype,
+                workers=workers,
+                threads=threads,
+                workspace=workspace,
+                metrics=metrics,
+            )
+            scores.append((SDR, ISR, SIR, SAR))
+        return scores
+
+    # arrays of the right type, such as memory-mapped ones, are not copied
+    estimates = np.asarray(estimates, dtype=dtype)
+    references = np.asarray(references, dtype=dtype)
 
     if padding:
         references, estimates = pad_or_truncate(references, estimates)
 
-    SDR, ISR, SIR, SAR, _ = metrics.bss_eval(
+    if isinstance(reference_cache, str):
+        reference_cache = ReferenceCache(reference_cache)
+
+    scores = bsseval.bss_eval_multiresolution(
         references,
         estimates,
+        resolutions=resolutions,
         compute_permutation=False,
-        window=win,
-        hop=hop,
         framewise_filters=(mode == "v3"),
         bsseval_sources_version=False,
+        dtype=dtype,
+        workers=workers,
+        threads=threads,
+        reference_cache=reference_cache,
+        workspace=workspace,
+        metrics=metrics,
     )
 
-    return SDR, ISR, SIR, SAR
+    return [(SDR, ISR, SIR, SAR) for SDR, ISR, SIR, SAR, _ in scores]
+
+
+def _evaluate_scores(
+    references,
+    estimates,
+    resolutions,
+    block_size=None,
+    dtype=np.float64,
+    metrics=METRICS,
+    **kwargs
+):
+    """Framewise scores of the BSS Eval metrics and of the cheap metrics
+    among `metrics` for each resolution, see `evaluate_multiresolution` for
+    the parameters.
+
+    Returns
+    -------
+    scores : List(Dict)
+        nsrc X nwin matrix of scores of each metric by name, for each
+        resolution
+    """
+    for metric in metrics:
+        if metric not in METRICS + cheap_metrics.METRICS:
+            raise ValueError(
+                "Unknown metric {}, should be one of {}".format(
+                    metric, METRICS + cheap_metrics.METRICS
+                )
+            )
+    if block_size is None:
+        # the signals are loaded once for both families of metrics
+        references, estimates = pad_or_truncate(
+            np.asarray(references, dtype=dtype), np.asarray(estimates, dtype=dtype)
+        )
+
+    scores = [{} for resolution in resolutions]
+    bss_metrics = tuple(metric for metric in metrics if metric in METRICS)
+    if bss_metrics:
+        bss_scores = evaluate_multiresolution(
+            references,
+            estimates,
+            resolutions=resolutions,
+            block_size=block_size,
+            dtype=dtype,
+            metrics=bss_metrics,
+            **kwargs
+        )
+        for values, (SDR, ISR, SIR, SAR) in zip(scores, bss_scores):
+            for metric, score in zip(
+                ["SDR", "SIR", "ISR", "SAR"], [SDR, SIR, ISR, SAR]
+            ):
+                if metric in bss_metrics:
+                    values[metric] = score
+
+    cheap = tuple(metric for metric in metrics if metric in cheap_metrics.METRICS)
+    if cheap:
+        for values, (win, hop) in zip(scores, resolutions):
+            values.update(
+                cheap_metrics.cheap_eval(
+                    references,
+                    estimates,
+                    window=win,
+                    hop=hop,
+                    metrics=cheap,
+                    block_size=block_size or 2**16,
+                )
+            )
+    return scores
+
+
+def _resolution_samples(resolutions, rate):
+    """window and hop sizes of the resolutions from seconds to samples, an
+    infinite window being kept as is"""
+    return [
+        tuple(size if np.isinf(size) else int(size * rate) for size in resolution)
+        for resolution in resolutions
+    ]
+
+
+def _resolution_name(win, hop):
+    """name of the output folder of the results of a resolution"""
+    return "win{:g}_hop{:g}".format(win, hop)
+
+
+def precision_deviation(
+    references,
+    estimates,
+    win=1 * 44100,
+    hop=1 * 44100,
+    mode="v4",
+    padding=True,
+    dtype=np.float32,
+):
+    """Maximum deviation of the scores computed with a reduced precision
+    from the double precision scores, to check that `dtype` can be used to
+    evaluate a given track.
+
+    Parameters
+    ----------
+    references : np.ndarray, shape=(nsrc, nsampl, nchan)
+        array containing true reference sources
+    estimates : np.ndarray, shape=(nsrc, nsampl, nchan)
+        array containing estimated sources
+    window : int, defaults to 44100
+        window size in samples
+    hop : int
+        hop size in samples, defaults to 44100 (no overlap)
+    mode : str
+        BSSEval version, default to `v4`
+    dtype : np.dtype
+        reduced precision to be checked, defaults to `np.float32`
+    Returns
+    -------
+    deviations : Dict
+        maximum absolute difference in dB over all sources and frames for
+        each of `SDR`, `ISR`, `SIR` and `SAR`. Frames that are not finite in
+        both precisions are ignored.
+    """
+    kwargs = dict(win=win, hop=hop, mode=mode, padding=padding)
+    reference_scores = evaluate(references, estimates, dtype=np.float64, **kwargs)
+    scores = evaluate(references, estimates, dtype=dtype, **kwargs)
+
+    deviations = {}
+    for metric, expected, actual in zip(
+        ["SDR", "ISR", "SIR", "SAR"], reference_scores, scores
+    ):
+        finite = np.isfinite(expected) & np.isfinite(actual)
+        deviations[metric] = (
+            float(np.max(np.abs(expected[finite] - actual[finite])))
+            if np.any(finite)
+            else 0.0
+        )
+    return deviations
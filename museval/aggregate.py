@@ -55,20 +55,18 @@ class TrackStore(object):
         ----------
         target_name : str
             name of target to be added to list of targets
-        values : List(Dict)
-            List of framewise data entries, see `musdb.schema.json`
+        values : Dict
+            framewise scores of each metric, see `musdb.schema.json`. Only
+            the given metrics are stored.
         """
         target_data = {"name": target_name, "frames": []}
-        for i, _ in enumerate(values["SDR"]):
+        # the metrics in the order of the schema, then the other ones
+        metrics = _ordered_metrics(["SDR", "SIR", "SAR", "ISR"], values)
+        for i, _ in enumerate(values[metrics[0]] if metrics else []):
             frame_data = {
                 "time": i * self.hop,
                 "duration": self.win,
-                "metrics": {
-                    "SDR": self._q(values["SDR"][i]),
-                    "SIR": self._q(values["SIR"][i]),
-                    "SAR": self._q(values["SAR"][i]),
-                    "ISR": self._q(values["ISR"][i]),
-                },
+                "metrics": {metric: self._q(values[metric][i]) for metric in metrics},
             }
             target_data["frames"].append(frame_data)
 
@@ -111,7 +109,8 @@ class TrackStore(object):
         out = ""
         for t in self.scores["targets"]:
             out += t["name"].ljust(16) + "==> "
-            for metric in ["SDR", "SIR", "ISR", "SAR"]:
+            names = t["frames"][0]["metrics"] if t["frames"] else []
+            for metric in _ordered_metrics(["SDR", "SIR", "ISR", "SAR"], names):
                 out += (
                     metric
                     + ":"
@@ -131,7 +130,7 @@ class TrackStore(object):
 
     def _q(self, number, precision=".00001"):
         """quantiztion of BSSEval values"""
-        if np.isinf(number):
+        if not np.isfinite(number):
             return np.nan
         else:
             return D(D(number).quantize(D(precision)))
@@ -257,15 +256,14 @@ class EvalStore(object):
         out = "Aggrated Scores ({} over frames, {} over tracks)\n".format(
             self.frames_agg, self.tracks_agg
         )
+        scores = self.agg_frames_tracks_scores().unstack()
         for target in targets:
             out += target.ljust(16) + "==> "
-            for metric in ["SDR", "SIR", "ISR", "SAR"]:
+            for metric in _ordered_metrics(["SDR", "SIR", "ISR", "SAR"], scores):
                 out += (
                     metric
                     + ":"
-                    + "{:>8.3f}".format(
-                        self.agg_frames_tracks_scores().unstack()[metric][target]
-                    )
+                    + "{:>8.3f}".format(scores[metric][target])
                     + "  "
                 )
             out += "\n"
@@ -418,8 +416,17 @@ def json2df(json_string, track_name):
         var_name="metric",
         value_name="score",
         id_vars=["time", "name"],
-        value_vars=["SDR", "SAR", "ISR", "SIR"],
+        value_vars=_ordered_metrics(
+            ["SDR", "SAR", "ISR", "SIR"],
+            [col for col in df.columns if col not in ["time", "duration", "name"]],
+        ),
     )
     df["track"] = track_name
     df = df.rename(index=str, columns={"name": "target"})
     return df
+
+
+def _ordered_metrics(order, names):
+    """metrics of `names` in the given order of the BSS Eval metrics, followed
+    by the other ones such as the cheap metrics of `museval.cheap_metrics`"""
+    return [m for m in order if m in names] + [m for m in names if m not in order]
@@ -0,0 +1,316 @@
+import os
+import glob
+import struct
+import tempfile
+import numpy as np
+import simplejson
+import soundfile as sf
+
+# name of the sidecar files holding the decoded estimates of a folder
+SIDECAR_NAME = ".museval-estimates"
+
+# WAV format tag of IEEE floating point samples
+WAVE_FORMAT_IEEE_FLOAT = 3
+
+# WAV format tag of the extensible format, whose subformat holds the tag
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioSources(object):
+    """
+    Audio of several sources read by blocks of samples.
+
+    This behaves as a read-only array of shape `(nsrc, nsampl, nchan)` that
+    is sliced along the samples, e.g. `sources[:, start:stop]`, only reading
+    those samples. It can be passed to `museval.evaluate` with a `block_size`
+    to evaluate recordings that do not fit into memory.
+
+    Attributes
+    ----------
+    sources : List(str or np.ndarray)
+        the audio of each source, either as the path of an audio file, or as
+        an array of shape `(nsampl, nchan)` such as a memory-mapped array
+    length : int, optional
+        number of samples, the sources being truncated or zero padded to this
+        length. Defaults to the length of the first source.
+    dtype : np.dtype
+        data type of the samples, defaults to `np.float64`
+    mmap : bool
+        memory-map the uncompressed floating point WAV files instead of
+        reading them with `soundfile`, defaults to `False`
+    """
+
+    def __init__(self, sources, length=None, dtype=np.float64, mmap=False):
+        super(AudioSources, self).__init__()
+        self.sources = list(sources)
+        shapes = []
+        self.rate = None
+        for j, source in enumerate(self.sources):
+            if isinstance(source, str):
+                info = sf.info(source)
+                self.rate = self.rate or info.samplerate
+                shapes.append((info.frames, info.channels))
+                audio = _wav_memmap(source) if mmap else None
+                if audio is not None:
+                    self.sources[j] = audio
+            else:
+                shapes.append(source.shape)
+        if length is None:
+            length = shapes[0][0] if shapes else 0
+        nchan = shapes[0][1] if shapes else 0
+        self.shape = (len(self.sources), int(length), nchan)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def paths(self):
+        return [source for source in self.sources if isinstance(source, str)]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        samples = key[1] if len(key) > 1 else slice(None)
+        (start, stop, step) = samples.indices(self.shape[1])
+        if step != 1:
+            raise IndexError("AudioSources only support contiguous slices")
+
+        out = np.zeros(
+            (self.shape[0], max(stop - start, 0), self.shape[2]), dtype=self.dtype
+        )
+        for j, source in enumerate(self.sources):
+            if stop <= start:
+                break
+            if isinstance(source, str):
+                audio, _ = sf.read(
+                    source,
+                    start=start,
+                    stop=stop,
+                    always_2d=True,
+                    dtype=self.dtype.name,
+                )
+            else:
+                audio = source[start:stop]
+            out[j, : len(audio)] = audio
+        return out[(key[0], slice(None)) + key[2:]]
+
+
+def load_audio(path, mmap=False, dtype=np.float64):
+    """Loads an audio file as an array of shape `(nsampl, nchan)`
+
+    Parameters
+    ----------
+    path : str
+        path to a `.npy` file or to an audio file supported by `soundfile`
+    mmap : bool
+        if `True`, `.npy` files and uncompressed floating point WAV files are
+        memory-mapped as read-only arrays instead of being read into memory,
+        the samples then keeping the data type of the file. The other files
+        are decoded to `dtype`. Defaults to `False`.
+    dtype : np.dtype
+        data type of the decoded samples, defaults to `np.float64`
+
+    Returns
+    -------
+    audio : np.ndarray, shape=(nsampl, nchan)
+        samples of the file
+    rate : int
+        sample rate, `None` for `.npy` files
+    """
+    if path.endswith(".npy"):
+        audio = np.load(path, mmap_mode="r" if mmap else None)
+        if not mmap:
+            audio = audio.astype(dtype)
+        return audio.reshape(audio.shape[0], -1), None
+    if mmap:
+        audio = _wav_memmap(path)
+        if audio is not None:
+            return audio, sf.info(path).samplerate
+    return sf.read(path, always_2d=True, dtype=np.dtype(dtype).name)
+
+
+def load_estimates_dir(path, ext="wav", mmap=False, sidecar=False):
+    """Loads the estimates of a folder, one file per target
+
+    Parameters
+    ----------
+    path : str
+        path to the estimates folder
+    ext : str
+        estimates file extension, defaults to `wav`
+    mmap : bool
+        memory-maps the files when possible, see `load_audio`
+    sidecar : bool
+        if `True`, the decoded estimates are stored into a `.npy` sidecar
+        file in the folder when it is first read. The next reads memory-map
+        the sidecar, as long as the estimates files are unchanged. Defaults
+        to `False`.
+
+    Returns
+    -------
+    estimates : Dict
+        arrays of shape `(nsampl, nchan)` of all the targets by name
+    rate : int
+        sample rate of the estimates
+    """
+    files = sorted(glob.glob(os.path.join(path, "*." + ext)))
+    signature = {
+        os.path.basename(f): [os.stat(f).st_size, os.stat(f).st_mtime_ns]
+        for f in files
+    }
+    if sidecar:
+        loaded = _load_sidecar(path, signature)
+        if loaded is not None:
+            return loaded
+
+    estimates = {}
+    rate = None
+    for estimate_file in files:
+        target_name = os.path.splitext(os.path.basename(estimate_file))[0]
+        try:
+            if sidecar and not mmap:
+                # decodes to the smallest exact data type
+                info = sf.info(estimate_file)
+                exact = info.subtype in ("PCM_S8", "PCM_U8", "PCM_16", "FLOAT")
+                audio, rate = load_audio(
+                    estimate_file, dtype=np.float32 if exact else np.float64
+                )
+            else:
+                audio, rate = load_audio(estimate_file, mmap=mmap)
+        except RuntimeError:
+            continue
+        estimates[target_name] = audio
+
+    if sidecar and estimates:
+        _save_sidecar(path, estimates, rate, signature)
+        loaded = _load_sidecar(path, signature)
+        if loaded is not None:
+            return loaded
+    return estimates, rate
+
+
+def _sidecar_paths(path):
+    return (
+        os.path.join(path, SIDECAR_NAME + ".npy"),
+        os.path.join(path, SIDECAR_NAME + ".json"),
+    )
+
+
+def _load_sidecar(path, signature):
+    """Memory-maps the sidecar of an estimates folder if it matches the
+    signature of the estimates files, returns `None` otherwise"""
+    (npy_path, json_path) = _sidecar_paths(path)
+    try:
+        with open(json_path) as f:
+            meta = simplejson.load(f)
+        if meta["files"] != signature:
+            return None
+        stack = np.load(npy_path, mmap_mode="r")
+        # the metadata is removed before the stack is replaced, checking it
+        # again ensures that the stack was not replaced meanwhile
+        with open(json_path) as f:
+            if simplejson.load(f) != meta:
+                return None
+    except (IOError, ValueError, KeyError):
+        return None
+    estimates = {
+        name: stack[j, :length]
+        for j, (name, length) in enumerate(zip(meta["targets"], meta["lengths"]))
+    }
+    return estimates, meta["rate"]
+
+
+def _save_sidecar(path, estimates, rate, signature):
+    """Stores the decoded estimates of a folder into its sidecar, stacked and
+    zero padded to the longest one"""
+    arrays = list(estimates.values())
+    if len(set(a.shape[1] for a in arrays)) != 1:
+        # estimates with different numbers of channels cannot be stacked
+        return
+    length = max(a.shape[0] for a in arrays)
+    (npy_path, json_path) = _sidecar_paths(path)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=path, suffix=".npy")
+        os.close(fd)
+        stack = np.lib.format.open_memmap(
+            tmp_path,
+            mode="w+",
+            dtype=np.result_type(*arrays),
+            shape=(len(arrays), length, arrays[0].shape[1]),
+        )
+        for j, audio in enumerate(arrays):
+            stack[j, : len(audio)] = audio
+        stack.flush()
+        del stack
+        # the previous metadata is invalidated before the stack is replaced,
+        # and both files appear atomically for concurrent evaluations
+        try:
+            os.remove(json_path)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, npy_path)
+        fd, tmp_path = tempfile.mkstemp(dir=path, suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            simplejson.dump(
+                {
+                    "targets": list(estimates),
+                    "lengths": [len(a) for a in arrays],
+                    "rate": rate,
+                    "files": signature,
+                },
+                f,
+            )
+        os.replace(tmp_path, json_path)
+    except (IOError, OSError):
+        # the folder may be read-only
+        pass
+
+
+def _wav_memmap(path):
+    """Memory-maps the samples of an uncompressed floating point WAV file as a
+    read-only nsampl X nchan array, returns `None` for any other file"""
+    try:
+        filesize = os.path.getsize(path)
+        with open(path, "rb") as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b"RIFF" or header[8:] != b"WAVE":
+                return None
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                (chunk_id, size) = (chunk[:4], struct.unpack("<I", chunk[4:])[0])
+                if chunk_id == b"data":
+                    offset = f.tell()
+                    break
+                data = f.read(size + size % 2)
+                if chunk_id == b"fmt " and size >= 16:
+                    (tag, nchan) = struct.unpack("<HH", data[:4])
+                    bits = struct.unpack("<H", data[14:16])[0]
+                    if tag == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                        tag = struct.unpack("<H", data[24:26])[0]
+                    fmt = (tag, nchan, bits)
+    except (IOError, struct.error):
+        return None
+    if fmt is None or fmt[0] != WAVE_FORMAT_IEEE_FLOAT or fmt[2] not in (32, 64):
+        return None
+    (_, nchan, bits) = fmt
+    sample_dtype = np.dtype("<f%d" % (bits // 8))
+    # the size of the data chunk may be unset for streamed files
+    size = min(size, filesize - offset)
+    nsampl = size // (nchan * sample_dtype.itemsize)
+    if nsampl == 0 or nchan == 0:
+        return None
+    return np.memmap(
+        path, dtype=sample_dtype, mode="r", offset=offset, shape=(nsampl, nchan)
+    )
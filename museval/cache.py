@@ -0,0 +1,552 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import time
+import numpy as np
+import simplejson
+from . import metrics
+from .aggregate import TrackStore
+from .version import _version
+
+# Default size limit of a ReferenceCache in bytes, enough for the bundles of
+# the 50 tracks of the musdb test set, of about 680 MB for 4 minutes of 4
+# stems each
+REFERENCE_CACHE_SIZE = 40 * 2**30
+
+
+class ReferenceCache(object):
+    """
+    On-disk cache of the reference side of the evaluation.
+
+    The references correlations and spectra of a track only depend on the
+    reference audio and on the length of the distortion filters. They are
+    stored once as `.npy` files in a directory named after a content hash of
+    those, and memory-mapped when the same references are evaluated again,
+    e.g. for another method or checkpoint. The references are hashed on
+    every lookup, which costs a pass over their samples.
+
+    Only the correlations G and the spectra are cached. The distortion
+    filters are still solved for on each evaluation, including the block
+    Levinson generators of the structured solver: they are computed once
+    per system, in a fraction of the time of the solve itself.
+
+    Attributes
+    ----------
+    path : str
+        directory holding the cached bundles
+    max_size : int, optional
+        maximum size of the cache in bytes. The least recently used bundles
+        are evicted when it is exceeded. Defaults to `REFERENCE_CACHE_SIZE`,
+        that is 40 GiB. `None` means that the cache is unbounded.
+    """
+
+    def __init__(self, path, max_size=REFERENCE_CACHE_SIZE):
+        super(ReferenceCache, self).__init__()
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, reference_sources, filters_len):
+        """content hash of the references and of the evaluation parameters,
+        whose cost grows with the length of the references since all their
+        samples are hashed
+
+        Parameters
+        ----------
+        reference_sources : np.ndarray, shape=(nsrc, nsampl, nchan)
+            matrix containing true sources
+        filters_len : int
+            length of the distortion filters
+
+        Returns
+        -------
+        key : str
+            hexadecimal digest
+        """
+        reference_sources = np.ascontiguousarray(reference_sources)
+        h = hashlib.blake2b(digest_size=20)
+        h.update(
+            repr(
+                (
+                    _version,
+                    reference_sources.shape,
+                    reference_sources.dtype.str,
+                    int(filters_len),
+                )
+            ).encode()
+        )
+        h.update(memoryview(reference_sources).cast("B"))
+        return h.hexdigest()
+
+    def reference_correlations(self, reference_sources, filters_len):
+        """Same as `metrics._compute_reference_correlations`, loaded from the
+        cache when the bundle of these references exists and stored into it
+        otherwise.
+
+        Returns
+        -------
+        G : np.ndarray
+            lag-domain references correlations
+        sf : np.ndarray
+            references spectra
+        """
+        key = self.key(reference_sources, filters_len)
+        bundle = self.load(key)
+        if bundle is None:
+            G, sf = metrics._compute_reference_correlations(
+                reference_sources, filters_len
+            )
+            self.save(key, G=G, sf=sf)
+            return G, sf
+        return bundle["G"], bundle["sf"]
+
+    def load(self, key):
+        """memory-maps a bundle
+
+        Parameters
+        ----------
+        key : str
+            bundle key
+
+        Returns
+        -------
+        bundle : Dict or None
+            arrays of the bundle, `None` if it is not cached
+        """
+        bundle_path = os.path.join(self.path, key)
+        try:
+            bundle = {
+                os.path.splitext(name)[0]: np.load(
+                    os.path.join(bundle_path, name), mmap_mode="r"
+                )
+                for name in os.listdir(bundle_path)
+                if name.endswith(".npy")
+            }
+        except (IOError, ValueError):
+            return None
+        if not bundle:
+            return None
+        # marks the bundle as recently used
+        os.utime(bundle_path)
+        return bundle
+
+    def save(self, key, **arrays):
+        """stores arrays as a bundle, and evicts the least recently used
+        bundles if the cache gets too large
+
+        Parameters
+        ----------
+        key : str
+            bundle key
+        arrays : np.ndarray
+            arrays of the bundle, by name
+        """
+        tmp_path = tempfile.mkdtemp(dir=self.path, prefix=".tmp")
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, name + ".npy"), array)
+            # bundles appear atomically for concurrent evaluations
+            os.replace(tmp_path, os.path.join(self.path, key))
+        except OSError:
+            # another process stored the same bundle in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """removes the least recently used bundles until the cache fits
+        into `max_size`"""
+        if self.max_size is None:
+            return
+        bundles = []
+        for name in os.listdir(self.path):
+            bundle_path = os.path.join(self.path, name)
+            if name.startswith(".") or not os.path.isdir(bundle_path):
+                continue
+            try:
+                size = sum(
+                    entry.stat().st_size for entry in os.scandir(bundle_path)
+                )
+                bundles.append((os.stat(bundle_path).st_mtime, size, bundle_path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in bundles)
+        for _, size, bundle_path in sorted(bundles):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(bundle_path, ignore_errors=True)
+            total -= size
+
+    def __repr__(self):
+        return "ReferenceCache({!r}, max_size={!r})".format(
+            self.path, self.max_size
+        )
+
+
+class _SharedCorrelations(object):
+    """
+    In-memory stand-in of a `ReferenceCache` for successive evaluations of
+    the same track.
+
+    The references correlations of an evaluation are kept, so that those of
+    the next evaluation are derived from them when its references are linear
+    combinations of the previous ones, such as the accompaniment of the
+    drums, bass and other stems, see `mix`. The other correlations are
+    computed, or read from `reference_cache` if given.
+    """
+
+    def __init__(self, reference_cache=None):
+        super(_SharedCorrelations, self).__init__()
+        self.reference_cache = reference_cache
+        self.correlations = None
+        self.mixing = None
+
+    def mix(self, mixing):
+        """the references of the next evaluation are `mixing @ references`
+        of the previous one, mixing being a nmix X nsrc matrix"""
+        self.mixing = np.asarray(mixing)
+
+    def reference_correlations(self, reference_sources, filters_len):
+        """Same as `ReferenceCache.reference_correlations`"""
+        (nsrc, nsampl, nchan) = reference_sources.shape
+        if self.mixing is not None and self.correlations is not None:
+            (G, sf, length) = self.correlations
+            n_fft = metrics._fft_length(nsampl, filters_len)
+            if (
+                length == filters_len
+                and self.mixing.shape == (nsrc, G.shape[0])
+                and sf.shape[1:] == (nchan, n_fft // 2 + 1)
+            ):
+                G, sf = metrics._mix_reference_correlations(G, sf, self.mixing)
+                self.mixing = None
+                self.correlations = (G, sf, filters_len)
+                return G, sf
+        if self.reference_cache is None:
+            G, sf = metrics._compute_reference_correlations(
+                reference_sources, filters_len
+            )
+        else:
+            G, sf = self.reference_cache.reference_correlations(
+                reference_sources, filters_len
+            )
+        self.mixing = None
+        self.correlations = (G, sf, filters_len)
+        return G, sf
+
+
+class ResultCache(object):
+    """
+    On-disk cache of the evaluation results.
+
+    The scores of a track only depend on its reference and estimated audio
+    and on the evaluation parameters. They are stored as a json file named
+    after a content hash of those, so that unchanged estimates, or identical
+    estimates of another method, are not evaluated again.
+
+    Attributes
+    ----------
+    path : str
+        directory holding the cached results
+    max_size : int, optional
+        maximum size of the cache in bytes, the least recently used results
+        being evicted when it is exceeded. Defaults to `None`, meaning that
+        the cache is unbounded, see `prune`.
+    """
+
+    def __init__(self, path, max_size=None):
+        super(ResultCache, self).__init__()
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, references, estimates, **params):
+        """content hash of the audio and of the evaluation parameters
+
+        Parameters
+        ----------
+        references : List(np.ndarray or str)
+            audio of the reference sources, or paths to their files
+        estimates : List(np.ndarray or str)
+            audio of the estimated sources, or paths to their files
+        params : Dict
+            evaluation parameters, such as the mode, the window and hop
+            sizes and the metrics
+
+        Returns
+        -------
+        key : str
+            hexadecimal digest
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(repr((_version, sorted(params.items()))).encode())
+        for audio in list(references) + list(estimates):
+            if isinstance(audio, str):
+                with open(audio, "rb") as f:
+                    for chunk in iter(lambda: f.read(2**20), b""):
+                        h.update(chunk)
+                continue
+            audio = np.ascontiguousarray(audio)
+            h.update(repr((audio.shape, audio.dtype.str)).encode())
+            h.update(memoryview(audio).cast("B"))
+        return h.hexdigest()
+
+    def load(self, key, track_name):
+        """loads the stored scores
+
+        Parameters
+        ----------
+        key : str
+            result key
+        track_name : str
+            name of the track of the scores
+
+        Returns
+        -------
+        scores : List(TrackStore) or None
+            scores of each resolution of the evaluation, `None` if they are
+            not cached
+        """
+        result_path = os.path.join(self.path, key + ".json")
+        try:
+            with open(result_path) as f:
+                result = simplejson.load(f, allow_nan=True)
+        except (IOError, ValueError):
+            return None
+        stores = []
+        for entry in result["stores"]:
+            store = TrackStore(
+                track_name=track_name, win=entry["win"], hop=entry["hop"]
+            )
+            # the scores are added as those of a fresh evaluation, so that
+            # both give the same stores
+            for target in entry["scores"]["targets"]:
+                frames = target["frames"]
+                store.add_target(
+                    target["name"],
+                    {
+                        metric: [frame["metrics"][metric] for frame in frames]
+                        for metric in (frames[0]["metrics"] if frames else [])
+                    },
+                )
+            stores.append(store)
+        # marks the result as recently used
+        os.utime(result_path)
+        return stores
+
+    def save(self, key, stores):
+        """stores the scores, and evicts the least recently used results if
+        the cache gets too large
+
+        Parameters
+        ----------
+        key : str
+            result key
+        stores : List(TrackStore)
+            scores of each resolution of the evaluation
+        """
+        result = {
+            "stores": [
+                {"win": store.win, "hop": store.hop, "scores": store.scores}
+                for store in stores
+            ]
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                simplejson.dump(result, f, allow_nan=True, use_decimal=True)
+            # results appear atomically for concurrent evaluations
+            os.replace(tmp_path, os.path.join(self.path, key + ".json"))
+        except OSError:
+            os.remove(tmp_path)
+        if self.max_size is not None:
+            self.prune(max_size=self.max_size)
+
+    def entries(self):
+        """cached results, from the least to the most recently used
+
+        Returns
+        -------
+        entries : List((str, int, float))
+            key, size in bytes and last use time of each result
+        """
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.startswith(".") or not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((entry.name[: -len(".json")], stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def prune(self, max_size=None, older_than=None):
+        """removes the results that were not used since `older_than`
+        seconds, then the least recently used ones until the cache fits into
+        `max_size` bytes
+
+        Returns
+        -------
+        removed : int
+            number of removed results
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for key, size, used in entries:
+            expired = older_than is not None and used < time.time() - older_than
+            if not expired and (max_size is None or total <= max_size):
+                continue
+            try:
+                os.remove(os.path.join(self.path, key + ".json"))
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def __repr__(self):
+        return "ResultCache({!r}, max_size={!r})".format(self.path, self.max_size)
+
+
+class StemCache(object):
+    """
+    On-disk cache of the decoded audio of the musdb reference targets.
+
+    Decoding the compressed stems, and summing the sources of targets such as
+    `accompaniment`, is repeated by every evaluation of the same tracks. The
+    audio of each target is stored once as a `.npy` file, in float32 when
+    this is exact as for the 16 bit stems, and memory-mapped by the next
+    evaluations as long as the source files of the target are unchanged.
+
+    Attributes
+    ----------
+    path : str
+        directory holding the decoded targets, one folder per track
+    """
+
+    def __init__(self, path):
+        super(StemCache, self).__init__()
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def signature(self, track, target):
+        """description of the source files of a target and of the decoding
+        parameters, `None` if the target is not read from files
+
+        Parameters
+        ----------
+        track : Track
+            musdb track
+        target : str
+            name of the target
+
+        Returns
+        -------
+        signature : Dict or None
+            json serializable signature
+        """
+        sources = []
+        for source in track.targets[target].sources:
+            if not os.path.isfile(str(source.path)):
+                return None
+            stat = os.stat(source.path)
+            sources.append(
+                [
+                    os.path.abspath(source.path),
+                    source.stem_id,
+                    float(source.gain),
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                ]
+            )
+        return {
+            "version": _version,
+            "sources": sources,
+            "rate": track.rate,
+            "chunk": [track.chunk_start, track.chunk_duration, track.sample_rate],
+        }
+
+    def audio(self, track, target):
+        """Same as `track.targets[target].audio`, memory-mapped from the cache
+        when the target was already decoded and stored into it otherwise.
+
+        Parameters
+        ----------
+        track : Track
+            musdb track
+        target : str
+            name of the target
+
+        Returns
+        -------
+        audio : np.ndarray, shape=(nsampl, nchan)
+            decoded audio of the target
+        """
+        signature = self.signature(track, target)
+        if signature is None:
+            return track.targets[target].audio
+        audio = self.load(track, target, signature)
+        if audio is None:
+            audio = track.targets[target].audio
+            self.save(track, target, signature, audio)
+        return audio
+
+    def load(self, track, target, signature):
+        """memory-maps a decoded target, `None` if it is not cached or if its
+        source files changed"""
+        (npy_path, json_path) = self._paths(track, target)
+        try:
+            with open(json_path) as f:
+                if simplejson.load(f) != signature:
+                    return None
+            audio = np.load(npy_path, mmap_mode="r")
+            # the signature is removed before the audio is replaced, checking
+            # it again ensures that the audio was not replaced meanwhile
+            with open(json_path) as f:
+                if simplejson.load(f) != signature:
+                    return None
+        except (IOError, ValueError):
+            return None
+        return audio
+
+    def save(self, track, target, signature, audio):
+        """stores a decoded target, in float32 when this is exact"""
+        (npy_path, json_path) = self._paths(track, target)
+        audio = np.asarray(audio)
+        if np.array_equal(audio.astype(np.float32), audio):
+            audio = audio.astype(np.float32)
+        track_path = os.path.dirname(npy_path)
+        try:
+            os.makedirs(track_path, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=track_path, prefix=".tmp", suffix=".npy"
+            )
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, audio)
+            # the previous signature is invalidated before the audio is
+            # replaced, and both files appear atomically for concurrent
+            # evaluations
+            try:
+                os.remove(json_path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, npy_path)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=track_path, prefix=".tmp", suffix=".json"
+            )
+            with os.fdopen(fd, "w") as f:
+                simplejson.dump(signature, f)
+            os.replace(tmp_path, json_path)
+        except OSError:
+            pass
+
+    def _paths(self, track, target):
+        track_path = os.path.join(self.path, track.subset or "", track.name)
+        return (
+            os.path.join(track_path, target + ".npy"),
+            os.path.join(track_path, target + ".json"),
+        )
+
+    def __repr__(self):
+        return "StemCache({!r})".format(self.path)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Cheap metrics, computed on the same frames as BSS Eval
+
+These energy ratios do not estimate any distortion filters, and cost a
+single pass over the samples. They are useful as fast proxies of the BSS
+Eval criteria, e.g. for model selection.
+
+Metrics
+-------
+
+* ``SI-SDR``: scale-invariant signal to distortion ratio, where the
+  reference source is first rescaled to best fit the estimate, the signals
+  of all channels of a frame being stacked into one vector [#leroux2019sisdr]_.
+  The signals are not made zero-mean.
+* ``SNR``: plain energy ratio between the reference source and the error of
+  the estimate, as the SDR of older separation campaigns.
+
+References
+----------
+  .. [#leroux2019sisdr] Jonathan Le Roux, Scott Wisdom, Hakan Erdogan and John
+     R. Hershey, "SDR - half-baked or well done?," In Proceedings of ICASSP
+     2019."""
+
+import numpy as np
+from .metrics import Framing
+
+# Names of the cheap metrics
+METRICS = ("SI-SDR", "SNR")
+
+
+def cheap_eval(
+    reference_sources,
+    estimated_sources,
+    window=2 * 44100,
+    hop=1.5 * 44100,
+    metrics=METRICS,
+    block_size=2**16,
+):
+    """Cheap metrics of each estimated source against the reference source
+    with the same index, on the frames of ``museval.metrics.Framing``.
+
+    The signals are read by blocks of samples with
+    ``sources[:, start:stop]``, so that they can also be memory-mapped
+    arrays or ``museval.AudioSources``.
+
+    Parameters
+    ----------
+    reference_sources : array_like, shape=(nsrc, nsampl, nchan)
+        matrix containing true sources
+    estimated_sources : array_like, shape=(nsrc, nsampl, nchan)
+        matrix containing estimated sources
+    window : int, optional
+        size of each window for time-varying evaluation, see ``bss_eval``
+    hop : int, optional
+        hop size between windows, see ``bss_eval``
+    metrics : tuple(str), optional
+        names of the metrics to compute among ``METRICS``, defaults to all of
+        them
+    block_size : int, optional
+        number of samples read at once, defaults to 2**16
+
+    Returns
+    -------
+    scores : Dict
+        nsrc X nwin matrix of scores of each metric by name, np.nan on the
+        frames where the reference source is silent"""
+    for metric in metrics:
+        if metric not in METRICS:
+            raise ValueError(
+                "Unknown metric {}, should be one of {}".format(metric, METRICS)
+            )
+    if reference_sources.shape != estimated_sources.shape:
+        raise ValueError(
+            "The shape of estimated sources and the true "
+            "sources should match. reference_sources.shape "
+            "= {}, estimated_sources.shape "
+            "= {}".format(reference_sources.shape, estimated_sources.shape)
+        )
+    (nsrc, nsampl) = reference_sources.shape[:2]
+    wins = list(Framing(window, hop, nsampl))
+    energies = _frame_energies(reference_sources, estimated_sources, wins, block_size)
+    (ref_ref, est_est, ref_est, err_err) = energies
+
+    scores = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if "SI-SDR" in metrics:
+            # energy ratio between the projection of the estimate on the
+            # reference and the rest of the estimate
+            scores["SI-SDR"] = 10 * np.log10(
+                ref_est**2 / np.maximum(ref_ref * est_est - ref_est**2, 0)
+            )
+        if "SNR" in metrics:
+            scores["SNR"] = 10 * np.log10(ref_ref / err_err)
+    for metric in scores:
+        scores[metric][ref_ref == 0] = np.nan
+    return scores
+
+
+def _frame_energies(reference_sources, estimated_sources, wins, block_size):
+    """Sums over the samples and channels of each frame of wins of the
+    products of the references and estimates, as the energies of the
+    references, of the estimates, their inner products and the energies of
+    the errors, each being nsrc X nwin. Those are reduced block by block, so
+    that the memory footprint is bounded by block_size."""
+    (nsrc, nsampl) = reference_sources.shape[:2]
+    starts = np.array([win.start for win in wins], dtype=int)
+    stops = np.array([win.stop for win in wins], dtype=int)
+    energies = np.zeros((4, nsrc, len(wins)))
+    block_size = int(max(block_size, 1))
+    for start in range(0, nsampl, block_size):
+        stop = min(start + block_size, nsampl)
+        # frames overlapping the block, and their part in the block
+        frames = np.flatnonzero((starts < stop) & (stops > start))
+        if not len(frames):
+            continue
+        bounds = np.stack(
+            (
+                np.maximum(starts[frames], start) - start,
+                np.minimum(stops[frames], stop) - start,
+            ),
+            axis=1,
+        ).ravel()
+
+        references = np.asarray(reference_sources[:, start:stop], dtype=np.float64)
+        estimates = np.asarray(estimated_sources[:, start:stop], dtype=np.float64)
+        references = references.reshape(nsrc, stop - start, -1)
+        estimates = estimates.reshape(nsrc, stop - start, -1)
+        errors = references - estimates
+        # per sample products, with a trailing zero for the frames ending at
+        # the end of the block
+        products = np.zeros((4, nsrc, stop - start + 1))
+        for k, (x, y) in enumerate(
+            (
+                (references, references),
+                (estimates, estimates),
+                (references, estimates),
+                (errors, errors),
+            )
+        ):
+            products[k, :, :-1] = np.einsum("snc,snc->sn", x, y)
+        energies[..., frames] += np.add.reduceat(products, bounds, axis=2)[..., ::2]
+    return energies
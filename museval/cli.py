@@ -1,10 +1,46 @@
 import sys
 import argparse
-from . import eval_mus_dir, eval_dir
+import os.path as op
+import time
+from . import eval_mus_dir, eval_dir, cheap_metrics, sharding, METRICS
+from .cache import ResultCache, ReferenceCache, REFERENCE_CACHE_SIZE
 from .version import _version
 import musdb
 
 
+def _resolution(value):
+    """parses a `WIN:HOP` resolution in seconds"""
+    try:
+        (win, hop) = (float(size) for size in value.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "resolutions should be given as WIN:HOP, got {}".format(value)
+        )
+    return (win, hop)
+
+
+def _shard(value):
+    """parses an `INDEX/COUNT` shard"""
+    try:
+        (index, count) = (int(n) for n in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "shards should be given as INDEX/COUNT, got {}".format(value)
+        )
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(
+            "the shard index should be in [0, COUNT), got {}".format(value)
+        )
+    return (index, count)
+
+
+def _reference_cache(args):
+    """the references cache of the `--reference-cache` arguments, if any"""
+    if args.reference_cache is None:
+        return None
+    return ReferenceCache(args.reference_cache, max_size=args.reference_cache_size)
+
+
 def bsseval(inargs=None):
     """
     Generic cli app for bsseval results. Expects two folder with
@@ -25,6 +61,69 @@ def bsseval(inargs=None):
         "-m", type=str, help="bss_eval version [`v3`, `v4`]", default="v4"
     )
 
+    parser.add_argument(
+        "--block-size",
+        type=int,
+        help="Read the audio files by blocks of this number of samples "
+        "instead of loading them into memory",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--mmap",
+        help="Memory-map the uncompressed floating point WAV files",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--sidecar",
+        help="Store the decoded estimates into a .npy sidecar file that is "
+        "memory-mapped by the next evaluations",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--metrics",
+        nargs="+",
+        choices=METRICS + cheap_metrics.METRICS,
+        help="Metrics to compute, defaults to all the BSS Eval ones",
+        default=METRICS,
+    )
+
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        type=_resolution,
+        metavar="WIN:HOP",
+        help="Evaluate several window and hop sizes in seconds at once, e.g. "
+        "`1:1 5:5 inf:1`, sharing the distortion filters",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--cache",
+        help="Directory of a cache of the scores, the unchanged estimates "
+        "not being evaluated again, see museval-cache",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--reference-cache",
+        help="Directory of a cache of the references correlations, shared by "
+        "the evaluations of other estimates of the same references",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--reference-cache-size",
+        type=int,
+        help="Maximum size of the references cache in bytes, the least "
+        "recently used correlations being evicted, defaults to 40 GiB",
+        default=REFERENCE_CACHE_SIZE,
+    )
+
     parser.add_argument(
         "--version", "-v", action="version", version="%%(prog)s %s" % _version
     )
@@ -44,9 +143,21 @@ def bsseval(inargs=None):
         mode=args.m,
         win=args.win,
         hop=args.hop,
+        block_size=args.block_size,
+        mmap=args.mmap,
+        sidecar=args.sidecar,
+        metrics=args.metrics,
+        resolutions=args.resolutions,
+        result_cache=args.cache,
+        reference_cache=_reference_cache(args),
     )
 
-    print(data)
+    if args.resolutions is None:
+        print(data)
+    else:
+        for (win, hop), scores in zip(args.resolutions, data):
+            print("win={:g}s hop={:g}s".format(win, hop))
+            print(scores)
 
 
 def museval(inargs=None):
@@ -67,6 +178,96 @@ def museval(inargs=None):
         action="store_true",
     )
 
+    parser.add_argument(
+        "--mmap",
+        help="Memory-map the uncompressed floating point WAV files",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--sidecar",
+        help="Store the decoded estimates into a .npy sidecar file that is "
+        "memory-mapped by the next evaluations",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--metrics",
+        nargs="+",
+        choices=METRICS + cheap_metrics.METRICS,
+        help="Metrics to compute, defaults to all the BSS Eval ones",
+        default=METRICS,
+    )
+
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        type=_resolution,
+        metavar="WIN:HOP",
+        help="Evaluate several window and hop sizes in seconds at once, e.g. "
+        "`1:1 5:5 inf:1`, sharing the distortion filters",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        help="Number of processes evaluating the tracks in parallel, "
+        "-1 for all the cores",
+        default=1,
+    )
+
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        help="Number of tracks decoded in advance while a track is evaluated, "
+        "0 to decode, evaluate and save each track in turn",
+        default=1,
+    )
+
+    parser.add_argument(
+        "--cache",
+        help="Directory of a cache of the scores, the unchanged estimates "
+        "not being evaluated again, see museval-cache",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--reference-cache",
+        help="Directory of a cache of the references correlations, shared by "
+        "the evaluations of other estimates of the same references",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--reference-cache-size",
+        type=int,
+        help="Maximum size of the references cache in bytes, the least "
+        "recently used correlations being evicted, defaults to 40 GiB",
+        default=REFERENCE_CACHE_SIZE,
+    )
+
+    parser.add_argument(
+        "--stem-cache",
+        help="Directory of a cache of the decoded musdb targets, which are "
+        "memory-mapped instead of decoding the stems again",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=_shard,
+        metavar="INDEX/COUNT",
+        help="Only evaluate the shard INDEX (from 0) of COUNT shards of the "
+        "tracks, balanced by duration. The results of the shards are merged "
+        "with museval-merge",
+        default=None,
+    )
+
     args = parser.parse_args(inargs)
     mus = musdb.DB(root=args.musdb, is_wav=args.is_wav)
 
@@ -80,7 +281,127 @@ def museval(inargs=None):
         dataset=mus,  # instance of musdb
         estimates_dir=args.estimates_dir,  # path to estiamte folder
         output_dir=output_dir,  # set a folder to write eval json files
+        mmap=args.mmap,
+        sidecar=args.sidecar,
+        metrics=args.metrics,
+        resolutions=args.resolutions,
+        n_jobs=args.jobs,
+        prefetch=args.prefetch,
+        shard=args.shard,
+        result_cache=args.cache,
+        stem_cache=args.stem_cache,
+        reference_cache=_reference_cache(args),
+    )
+
+
+def merge(inargs=None):
+    """
+    Merges the results of the shards of an evaluation, either json folders
+    or pickled EvalStore dataframes, checking that each track was evaluated
+    exactly once
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        type=str,
+        help="Output folders or EvalStore pickles of the shards",
+    )
+
+    parser.add_argument(
+        "-o", help="Merged output folder, or pickle path", required=True
+    )
+
+    parser.add_argument(
+        "--musdb",
+        help="Path to musdb, to check that all its tracks were evaluated",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--is-wav",
+        help="Read musdb wav instead of stems",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--subsets",
+        nargs="+",
+        help="Subsets of musdb that were evaluated, defaults to `test`",
+        default=["test"],
+    )
+
+    args = parser.parse_args(inargs)
+
+    tracks = None
+    if args.musdb is not None:
+        mus = musdb.DB(root=args.musdb, is_wav=args.is_wav, subsets=args.subsets)
+        tracks = [track.name for track in mus]
+
+    try:
+        if all(op.isdir(path) for path in args.inputs):
+            sharding.merge_eval_dirs(args.inputs, args.o, tracks=tracks)
+        else:
+            print(sharding.merge_eval_stores(args.inputs, args.o, tracks=tracks))
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+def cache(inargs=None):
+    """
+    Inspects and prunes a cache of the scores
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("cache_dir", type=str, help="Directory of the cache")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="List the cached scores")
+
+    prune_parser = subparsers.add_parser(
+        "prune", help="Remove the least recently used scores"
     )
+    prune_parser.add_argument(
+        "--max-size",
+        type=int,
+        help="Maximum size of the cache in bytes",
+        default=None,
+    )
+    prune_parser.add_argument(
+        "--older-than",
+        type=float,
+        help="Remove the scores not used for this number of days",
+        default=None,
+    )
+
+    subparsers.add_parser("clear", help="Remove all the cached scores")
+
+    args = parser.parse_args(inargs)
+    result_cache = ResultCache(args.cache_dir)
+
+    if args.command == "list":
+        entries = result_cache.entries()
+        for key, size, used in entries:
+            print(
+                "{}  {:>10d}  {}".format(
+                    key, size, time.strftime("%Y-%m-%d %H:%M", time.localtime(used))
+                )
+            )
+        print(
+            "{} results, {} bytes".format(
+                len(entries), sum(size for _, size, _ in entries)
+            )
+        )
+    elif args.command == "prune":
+        older_than = None if args.older_than is None else args.older_than * 86400
+        removed = result_cache.prune(max_size=args.max_size, older_than=older_than)
+        print("{} results removed".format(removed))
+    else:
+        removed = result_cache.prune(max_size=0)
+        print("{} results removed".format(removed))
 
 
 if __name__ == "__main__":
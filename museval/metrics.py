@@ -46,18 +46,38 @@ References
      1706, IRISA, April 2005."""
 
 import numpy as np
-import scipy.fftpack
-from scipy.linalg import toeplitz
-from scipy.signal import fftconvolve
+import scipy.fft
+import scipy.linalg
+import scipy.optimize
+from scipy.signal import oaconvolve
 import itertools
 import collections
+import concurrent.futures
+import queue
 import warnings
 
 # The maximum allowable number of sources (prevents insane computational load)
 MAX_SOURCES = 100
 
+# Minimum size nsrc*nchan*filters_len of the distortion filters systems solved
+# with the block-Toeplitz solver instead of a dense solver
+STRUCTURED_SOLVER_MIN_SIZE = 2048
 
-def validate(reference_sources, estimated_sources):
+# Names of the criteria, in the order returned by ``bss_eval``
+METRICS = ("SDR", "ISR", "SIR", "SAR")
+
+# Number of samples of the blocks reduced at once when computing the
+# statistics of the signals
+STATISTICS_BLOCK_SIZE = 2**16
+
+# Statistics of sources nsrc X nsampl X nchan, as given by
+# ``_signal_statistics``
+SignalStatistics = collections.namedtuple(
+    "SignalStatistics", ["active", "silent", "finite"]
+)
+
+
+def validate(reference_sources, estimated_sources, statistics=None):
     """Checks that the input data to a metric are valid, and throws helpful
     errors if not.
 
@@ -66,7 +86,10 @@ def validate(reference_sources, estimated_sources):
     reference_sources : np.ndarray, shape=(nsrc, nsampl,nchan)
         matrix containing true sources
     estimated_sources : np.ndarray, shape=(nsrc, nsampl,nchan)
-        matrix containing estimated sources"""
+        matrix containing estimated sources
+    statistics : tuple(SignalStatistics), optional
+        statistics of the reference and of the estimated sources, as given
+        by ``_signal_statistics``, computed if not provided"""
 
     if reference_sources.shape != estimated_sources.shape:
         raise ValueError(
@@ -84,13 +107,25 @@ def validate(reference_sources, estimated_sources):
             "= {}".format(reference_sources.ndim, estimated_sources.ndim)
         )
 
+    if statistics is None:
+        statistics = (
+            _signal_statistics(np.atleast_3d(reference_sources), []),
+            _signal_statistics(np.atleast_3d(estimated_sources), []),
+        )
+    (reference_statistics, estimated_statistics) = statistics
+
     if reference_sources.size == 0:
         warnings.warn(
             "reference_sources is empty, should be of size "
             "(nsrc, nsample, nchan). sdr, isr sir, sar, and perm "
             "will all be empty np.ndarrays"
         )
-    elif _any_source_silent(reference_sources):
+    elif not np.all(reference_statistics.finite):
+        raise ValueError(
+            "All the reference sources should be finite, but at least one of "
+            "the reference sources holds NaN or infinite values."
+        )
+    elif np.any(reference_statistics.silent):
         raise ValueError(
             "All the reference sources should be non-silent (not "
             "all-zeros), but at least one of the reference "
@@ -105,7 +140,12 @@ def validate(reference_sources, estimated_sources):
             "(nsrc, nsample, nchan).  sdr, isr, sir, sar, and perm "
             "will all be empty np.ndarrays"
         )
-    elif _any_source_silent(estimated_sources):
+    elif not np.all(estimated_statistics.finite):
+        raise ValueError(
+            "All the estimated sources should be finite, but at least one of "
+            "the estimated sources holds NaN or infinite values."
+        )
+    elif np.any(estimated_statistics.silent):
         raise ValueError(
             "All the estimated sources should be non-silent (not "
             "all-zeros), but at least one of the estimated "
@@ -138,6 +178,38 @@ def _any_source_silent(sources):
     )
 
 
+def _signal_statistics(sources, wins):
+    """Statistics of sources nsrc X nsampl X nchan computed in a single pass
+    over the samples, by blocks of ``STATISTICS_BLOCK_SIZE`` samples.
+
+    A source is silent at a sample when the sum of its channels is zero, as
+    checked by ``_any_source_silent``.
+    Returns a ``SignalStatistics`` with whether the sources are active (not
+    silent, nsrc X nwin) over each frame of wins, whether they are silent
+    over the whole signals (nsrc), and whether they are finite (nsrc)"""
+    (nsrc, nsampl) = sources.shape[:2]
+    # per sample statistics, with a trailing zero for the frames ending at
+    # the end of the signals
+    nonzero = np.zeros((nsrc, nsampl + 1), dtype=bool)
+    finite = np.ones(nsrc, dtype=bool)
+    for start in range(0, nsampl, STATISTICS_BLOCK_SIZE):
+        stop = min(start + STATISTICS_BLOCK_SIZE, nsampl)
+        block = np.asarray(sources[:, start:stop], dtype=np.float64)
+        block = block.reshape(nsrc, stop - start, -1)
+        total = np.sum(block, axis=2)
+        nonzero[:, start:stop] = total != 0
+        finite &= np.all(np.isfinite(total), axis=1)
+
+    active = np.zeros((nsrc, len(wins)), dtype=bool)
+    starts = np.array([win.start for win in wins], dtype=int)
+    stops = np.array([win.stop for win in wins], dtype=int)
+    valid = stops > starts
+    if np.any(valid):
+        bounds = np.stack((starts[valid], stops[valid]), axis=1).ravel()
+        active[:, valid] = np.logical_or.reduceat(nonzero, bounds, axis=1)[:, ::2]
+    return SignalStatistics(active, ~np.any(nonzero, axis=1), finite)
+
+
 def bss_eval(
     reference_sources,
     estimated_sources,
@@ -147,6 +219,12 @@ def bss_eval(
     filters_len=512,
     framewise_filters=False,
     bsseval_sources_version=False,
+    dtype=np.float64,
+    workers=1,
+    reference_cache=None,
+    workspace=None,
+    metrics=METRICS,
+    threads=1,
 ):
     """BSS_EVAL version 4.
 
@@ -207,6 +285,37 @@ def bss_eval(
           those to also be zeroed in the references, and hence not evaluated,
           artificially boosting results. For this reason, SiSEC always uses
           the `bss_eval_images` version, corresponding to ``False``.
+      dtype : np.dtype, optional
+          floating point precision of the computations, defaults to
+          ``np.float64``. With ``np.float32``, the signals, their zero padded
+          copies and spectra, and their projections are kept in single
+          precision, which lowers the memory footprint, by about a quarter on
+          a musdb track. The correlations are transformed back, and the
+          distortion filters systems and the energies are computed, in double
+          precision because of the poor conditioning of the systems. See
+          ``museval.precision_deviation`` to check the deviation on a track.
+      workers : int, optional
+          maximum number of threads used by the Fourier transforms, including
+          those of the convolutions, defaults to 1. Negative values wrap
+          around ``os.cpu_count()``, see ``scipy.fft.set_workers``.
+      reference_cache : museval.cache.ReferenceCache, optional
+          on-disk cache of the references correlations and spectra, that are
+          then computed only once for the same references and filters_len.
+          Only used with time-invariant filters. Defaults to ``None``.
+      workspace : Workspace, optional
+          buffers of the temporaries, that can be shared by successive calls
+          to avoid reallocating them for each track. Defaults to ``None``,
+          creating a workspace for this call only.
+      metrics : tuple(str), optional
+          names of the criteria to compute among ``METRICS``, the others
+          being returned as ``np.nan``. The computations that only feed the
+          other criteria are skipped, e.g. the SDR of the images does not
+          need any distortion filters. Defaults to all the criteria.
+      threads : int, optional
+          number of threads running the independent computations of the
+          sources in parallel, such as their distortion filters solves and
+          their projections, defaults to 1. The Fourier transforms of each
+          thread are single-threaded, ``workers`` being used by the others.
 
       Returns
       -------
@@ -234,118 +343,231 @@ def bss_eval(
     .. [#vincent2005bssevalv3] Emmanuel Vincent, Rémi Gribonval, and Cédric
         Févotte, "Performance measurement in blind audio source separation," IEEE
         Trans. on Audio, Speech and Language Processing, 2006."""
+    return _bss_eval(
+        reference_sources,
+        estimated_sources,
+        [(window, hop)],
+        compute_permutation,
+        filters_len,
+        framewise_filters,
+        bsseval_sources_version,
+        dtype,
+        workers,
+        reference_cache,
+        workspace,
+        metrics,
+        threads,
+    )[0]
+
+
+def bss_eval_multiresolution(
+    reference_sources,
+    estimated_sources,
+    resolutions=((2 * 44100, 1.5 * 44100),),
+    compute_permutation=False,
+    filters_len=512,
+    framewise_filters=False,
+    bsseval_sources_version=False,
+    dtype=np.float64,
+    workers=1,
+    reference_cache=None,
+    workspace=None,
+    metrics=METRICS,
+    threads=1,
+):
+    """``bss_eval`` with several framings of the same signals.
 
-    # assuming input is in shape (nsampl) or (nsrc, nsampl)
-    estimated_sources = np.atleast_3d(estimated_sources)
-    reference_sources = np.atleast_3d(reference_sources)
+    The frames of all the resolutions are evaluated together, so that with
+    time-invariant filters, the correlations, the distortion filters and the
+    projections of the signals are only computed once, each resolution only
+    adding the reductions of the energies over its frames. With framewise
+    filters, the filters of each frame are still estimated anew.
+
+    Parameters
+    ----------
+    reference_sources : np.ndarray, shape=(nsrc, nsampl, nchan)
+        matrix containing true sources
+    estimated_sources : np.ndarray, shape=(nsrc, nsampl, nchan)
+        matrix containing estimated sources
+    resolutions : List((int, int)), optional
+        window and hop sizes of each framing, see ``bss_eval``. A window
+        of ``np.inf`` computes the metrics on the whole signals.
+    compute_permutation, filters_len, framewise_filters, bsseval_sources_version
+        see ``bss_eval``
+    dtype, workers, reference_cache, workspace, metrics, threads
+        see ``bss_eval``
+
+    Returns
+    -------
+    scores : List((sdr, isr, sir, sar, perm))
+        the results of ``bss_eval`` for each resolution"""
+    return _bss_eval(
+        reference_sources,
+        estimated_sources,
+        list(resolutions),
+        compute_permutation,
+        filters_len,
+        framewise_filters,
+        bsseval_sources_version,
+        dtype,
+        workers,
+        reference_cache,
+        workspace,
+        metrics,
+        threads,
+    )
 
-    # validate input
-    validate(reference_sources, estimated_sources)
+
+def _bss_eval(
+    reference_sources,
+    estimated_sources,
+    resolutions,
+    compute_permutation,
+    filters_len,
+    framewise_filters,
+    bsseval_sources_version,
+    dtype,
+    workers,
+    reference_cache,
+    workspace,
+    metrics,
+    threads,
+):
+    """``bss_eval`` over the frames of all the (window, hop) resolutions,
+    returning the results of each of them"""
+    # assuming input is in shape (nsampl) or (nsrc, nsampl)
+    estimated_sources = np.atleast_3d(np.asarray(estimated_sources, dtype=dtype))
+    reference_sources = np.atleast_3d(np.asarray(reference_sources, dtype=dtype))
+
+    # initialize variables, the frames of all the resolutions being
+    # evaluated together
+    framings = [
+        list(Framing(window, hop, estimated_sources.shape[1]))
+        for (window, hop) in resolutions
+    ]
+    wins = [win for framing in framings for win in framing]
+    offsets = np.cumsum([0] + [len(framing) for framing in framings])
+
+    # energies, silences and non-finite values of the signals in a single
+    # pass, before validating the input
+    statistics = (
+        _signal_statistics(reference_sources, wins),
+        _signal_statistics(estimated_sources, wins),
+    )
+    validate(reference_sources, estimated_sources, statistics)
 
     # If empty matrices were supplied, return empty lists (special case)
     if reference_sources.size == 0 or estimated_sources.size == 0:
-        return (np.array([]), np.array([]), np.array([]), np.array([]), np.array([]))
+        empty = (np.array([]), np.array([]), np.array([]), np.array([]), np.array([]))
+        return [empty for framing in framings]
 
     # determine shape parameters
     (nsrc, nsampl, nchan) = estimated_sources.shape
 
     # defines all the permutations desired by user
-    if compute_permutation:
-        candidate_permutations = np.array(
-            list(itertools.permutations(list(range(nsrc))))
-        )
-    else:
-        candidate_permutations = np.array(np.arange(nsrc))[None, :]
+    candidate_permutations = _candidate_permutations(nsrc, compute_permutation)
 
-    # initialize variables
-    framer = Framing(window, hop, nsampl)
-    nwin = framer.nwin
-
-    (SDR, ISR, SIR, SAR) = list(range(4))
-    s_r = np.empty((4, nsrc, nsrc, nwin))
-
-    # define helper functions for computing filters on windows of the signals
-    def compute_GsfC(win=slice(0, nsampl)):
-        # First compute the references correlations
-        G, sf = _compute_reference_correlations(reference_sources[:, win], filters_len)
-        # compute the interference distortion filters
-        C = np.zeros((nsrc, nsrc, nchan, filters_len, nchan))
-        for jtrue in range(nsrc):
-            C[jtrue] = _compute_projection_filters(G, sf, estimated_sources[jtrue, win])
-        return (G, sf, C)
-
-    def compute_Cj(win=slice(0, nsampl)):
-        Cj = np.zeros((nsrc, nsrc, 1, nchan, filters_len, nchan))
-        for jtrue in range(nsrc):
-            for jest in candidate_permutations[:, jtrue]:
-                # compute the projection filters for this combination
-                Cj[jtrue, jest] = _compute_projection_filters(
-                    G[jtrue, jtrue], sf[jtrue], estimated_sources[jest, win]
+    # frames where all the sources are active, the others being silent
+    active = np.all(statistics[0].active, axis=0) & np.all(
+        statistics[1].active, axis=0
+    )
+    s_r = np.full((4, nsrc, nsrc, len(wins)), np.nan)
+    if workspace is None:
+        workspace = Workspace()
+
+    # only the filters needed by the requested criteria are computed
+    computed = _computed_metrics(metrics, compute_permutation)
+    (with_C, with_Cj) = _required_filters(bsseval_sources_version, computed)
+    zero_filters = _zero_filters(nsrc, nchan, filters_len, dtype)
+
+    # all Fourier transforms below share the requested number of threads,
+    # the sources being evaluated in parallel by the threads of the pool
+    with scipy.fft.set_workers(workers), _SourcePool(threads, workspace) as pool:
+        if not framewise_filters and not (with_C or with_Cj):
+            (C, Cj) = zero_filters
+        elif not framewise_filters:
+            # compute filters on whole signals if no framewise filters, the
+            # references correlations being possibly cached
+            if reference_cache is None:
+                G, sf = _compute_reference_correlations(
+                    reference_sources, filters_len, workspace
                 )
-        return Cj
-
-    if not framewise_filters:
-        # compute filters on whole signals if no framewise filters
-        (G, sf, C) = compute_GsfC()
-        Cj = compute_Cj()
-
-    # loop over all windows
-    for t, win in enumerate(framer):
-        # if we have time-varying distortion filters
-        if framewise_filters:
-            (G, sf, C) = compute_GsfC(win)
-            Cj = compute_Cj(win)
-
-        # loop over all permutations
-        done = np.zeros((nsrc, nsrc))
-
-        ref_slice = reference_sources[:, win]
-        est_slice = estimated_sources[:, win]
-        if not _any_source_silent(ref_slice) and not _any_source_silent(est_slice):
-            for jtrue in range(nsrc):
-                for k, jest in enumerate(candidate_permutations[:, jtrue]):
-                    # if we have a silent frame set results as np.nan
-                    if not done[jtrue, jest]:
-                        s_true, e_spat, e_interf, e_artif = _bss_decomp_mtifilt(
-                            reference_sources[:, win],
-                            estimated_sources[jest, win],
-                            jtrue,
-                            C[jest],
-                            Cj[jtrue, jest, 0],
-                        )
-                        s_r[:, jtrue, jest, t] = _bss_crit(
-                            s_true, e_spat, e_interf, e_artif, bsseval_sources_version
-                        )
-                        done[jtrue, jest] = True
+            else:
+                G, sf = reference_cache.reference_correlations(
+                    reference_sources, filters_len
+                )
+            # then the correlations of all estimates with the references
+            D = _compute_estimates_correlations(
+                sf, estimated_sources, filters_len, workspace
+            )
+            (C, Cj) = _compute_filters(
+                G, D, candidate_permutations, dtype, with_C, with_Cj, pool
+            )
+        if not framewise_filters:
+            # the filters being time-invariant, the whole signals are projected
+            # once for all windows
+            s_r = _bss_eval_fixed_filters(
+                reference_sources,
+                estimated_sources,
+                candidate_permutations,
+                C,
+                Cj,
+                wins,
+                bsseval_sources_version,
+                active,
+                workspace,
+                computed,
+                pool,
+            )
         else:
-            a = np.empty((4, nsrc, nsrc))
-            a[:] = np.nan
-            s_r[:, :, :, t] = a
-
-    # select the best ordering
-    if framewise_filters:
-        # if we have framewise filters, output one permutation for each window
-        mean_sir = np.empty((len(candidate_permutations), nwin))
-        axis_mean = 0
-    else:
-        # otherwise, output one permutation for the whole signal as the best
-        # average one
-        mean_sir = np.empty((len(candidate_permutations), 1))
-        axis_mean = None
-    dum = np.arange(nsrc)
-    for i, perm in enumerate(candidate_permutations):
-        mean_sir[i] = np.mean(s_r[SIR, dum, perm, :], axis=axis_mean)
-    popt = candidate_permutations[np.argmax(mean_sir, axis=0)].T
-
-    # now prepare the output
-    if not framewise_filters:
-        result = s_r[:, dum, popt[:, 0], :]
-    else:
-        result = np.empty((4, nsrc, nwin))
-        for m, t in itertools.product(list(range(4)), list(range(nwin))):
-            result[m, :, t] = s_r[m, dum, popt[:, t], t]
+            # loop over all windows with time-varying distortion filters, the
+            # correlations being updated from one window to the next of each
+            # framing
+            if with_C or with_Cj:
+                correlations = itertools.chain.from_iterable(
+                    _sliding_correlations(
+                        reference_sources,
+                        estimated_sources,
+                        framing,
+                        filters_len,
+                        active[first:last],
+                        workspace,
+                    )
+                    for (framing, first, last) in zip(
+                        framings, offsets[:-1], offsets[1:]
+                    )
+                )
+            else:
+                correlations = ((win, None, None) for win in wins)
+            for t, (win, G, D) in enumerate(correlations):
+                if not active[t]:
+                    # no filters are estimated for the silent frames
+                    continue
+                (C, Cj) = (
+                    zero_filters
+                    if G is None
+                    else _compute_filters(
+                        G, D, candidate_permutations, dtype, with_C, with_Cj, pool
+                    )
+                )
+                s_r[:, :, :, t] = _bss_eval_frame(
+                    reference_sources[:, win],
+                    estimated_sources[:, win],
+                    candidate_permutations,
+                    C,
+                    Cj,
+                    bsseval_sources_version,
+                    workspace,
+                    computed,
+                    pool,
+                )
 
-    return (result[SDR], result[ISR], result[SIR], result[SAR], popt)
+    return [
+        _select_ordering(
+            s_r[..., first:last], compute_permutation, framewise_filters, metrics
+        )
+        for (first, last) in zip(offsets[:-1], offsets[1:])
+    ]
 
 
 def bss_eval_sources(reference_sources, estimated_sources, compute_permutation=True):
@@ -443,7 +665,320 @@ def bss_eval_images_framewise(
     )
 
 
+def bss_eval_streaming(
+    reference_sources,
+    estimated_sources,
+    window=2 * 44100,
+    hop=1.5 * 44100,
+    compute_permutation=False,
+    filters_len=512,
+    framewise_filters=False,
+    bsseval_sources_version=False,
+    block_size=2**20,
+    dtype=np.float64,
+    workers=1,
+    workspace=None,
+    metrics=METRICS,
+    threads=1,
+):
+    """Out-of-core version of ``bss_eval``, for signals that do not fit into
+    memory.
+
+    The sources are only read by blocks of at most ``block_size`` samples
+    with ``sources[:, start:stop]``, so that they can be memory-mapped arrays
+    such as given by ``np.load(path, mmap_mode="r")``, or audio files read
+    with ``museval.AudioSources``. With time-invariant filters, a first pass
+    over the blocks accumulates the correlations of the signals, and a
+    second pass computes the energies of the frames, so that the memory
+    footprint is bounded by the block size instead of the signals length.
+    With framewise filters, the windows are read and evaluated one at a time,
+    the memory footprint being then bounded by the window size.
+
+    Parameters
+    ----------
+    reference_sources : array_like, shape=(nsrc, nsampl, nchan)
+        matrix containing true sources, that can be sliced along the samples
+    estimated_sources : array_like, shape=(nsrc, nsampl, nchan)
+        matrix containing estimated sources, that can be sliced along the
+        samples
+    block_size : int, optional
+        number of samples of the blocks, defaults to 2**20
+    window, hop, compute_permutation, filters_len, framewise_filters
+        see ``bss_eval``
+    bsseval_sources_version, dtype, workers, workspace, metrics, threads
+        see ``bss_eval``
+
+    Returns
+    -------
+    sdr, isr, sir, sar, perm : np.ndarray
+        see ``bss_eval``"""
+    if reference_sources.shape != estimated_sources.shape:
+        raise ValueError(
+            "The shape of estimated sources and the true "
+            "sources should match. reference_sources.shape "
+            "= {}, estimated_sources.shape "
+            "= {}".format(reference_sources.shape, estimated_sources.shape)
+        )
+    if len(reference_sources.shape) != 3:
+        raise ValueError(
+            "The sources should be of shape (nsrc, nsampl, nchan) to be read by "
+            "blocks, got {}".format(reference_sources.shape)
+        )
+    (nsrc, nsampl, nchan) = reference_sources.shape
+    if nsrc == 0 or nsampl == 0 or nchan == 0:
+        return bss_eval(
+            np.empty(reference_sources.shape), np.empty(estimated_sources.shape)
+        )
+    block_size = int(max(block_size, filters_len))
+    if workspace is None:
+        workspace = Workspace()
+    computed = _computed_metrics(metrics, compute_permutation)
+    (with_C, with_Cj) = _required_filters(bsseval_sources_version, computed)
+    zero_filters = _zero_filters(nsrc, nchan, filters_len, dtype)
+
+    candidate_permutations = _candidate_permutations(nsrc, compute_permutation)
+    wins = list(Framing(window, hop, nsampl))
+    s_r = np.full((4, nsrc, nsrc, len(wins)), np.nan)
+
+    def read(sources, start, stop):
+        return np.asarray(sources[:, start:stop], dtype=dtype)
+
+    def check_silent(active):
+        if not np.all(active):
+            raise ValueError(
+                "All the reference and estimated sources should be non-silent "
+                "(not all-zeros), but at least one of them is all 0s."
+            )
+
+    with scipy.fft.set_workers(workers), _SourcePool(threads, workspace) as pool:
+        if framewise_filters:
+            active = np.zeros((2, nsrc), dtype=bool)
+            for start in range(0, nsampl, block_size):
+                for k, sources in enumerate((reference_sources, estimated_sources)):
+                    block = read(sources, start, start + block_size)
+                    active[k] |= np.any(np.sum(block, axis=2) != 0, axis=1)
+            check_silent(active)
+
+            # the windows are evaluated one at a time
+            for t, win in enumerate(wins):
+                references = read(reference_sources, win.start, win.stop)
+                estimates = read(estimated_sources, win.start, win.stop)
+                if _any_source_silent(references) or _any_source_silent(estimates):
+                    # no filters are estimated for the silent frames
+                    continue
+                (C, Cj) = zero_filters
+                if with_C or with_Cj:
+                    G, sf = _compute_reference_correlations(
+                        references, filters_len, workspace
+                    )
+                    D = _compute_estimates_correlations(
+                        sf, estimates, filters_len, workspace
+                    )
+                    (C, Cj) = _compute_filters(
+                        G, D, candidate_permutations, dtype, with_C, with_Cj, pool
+                    )
+                s_r[..., t] = _bss_eval_frame(
+                    references,
+                    estimates,
+                    candidate_permutations,
+                    C,
+                    Cj,
+                    bsseval_sources_version,
+                    workspace,
+                    computed,
+                    pool,
+                )
+            return _select_ordering(
+                s_r, compute_permutation, framewise_filters, metrics
+            )
+
+        # first pass: correlations of the whole signals, as the sum of the
+        # correlations of the blocks with their neighbourhoods, while checking
+        # that no source is silent
+        lags = 0
+        active = np.zeros((2, nsrc), dtype=bool)
+        for start in range(0, nsampl, block_size):
+            stop = min(start + block_size, nsampl)
+            # block with its neighbourhood
+            lo = max(start - filters_len + 1, 0)
+            hi = min(stop + filters_len - 1, nsampl)
+            references = read(reference_sources, lo, hi)
+            estimates = read(estimated_sources, lo, hi)
+            if with_C or with_Cj:
+                lags = lags + _compute_boundary_correlations(
+                    references,
+                    estimates,
+                    filters_len,
+                    (start - filters_len + 1 - lo, stop + filters_len - 1 - lo),
+                    (start - lo, stop - lo),
+                    workspace,
+                )
+            for k, sources in enumerate((references, estimates)):
+                block = sources[:, start - lo : stop - lo]
+                active[k] |= np.any(np.sum(block, axis=2) != 0, axis=1)
+        check_silent(active)
+        (C, Cj) = zero_filters
+        if with_C or with_Cj:
+            G = _G_from_lags(lags[:, : nsrc * nchan], nsrc)
+            D = _D_from_lags(lags[:, nsrc * nchan :], nsrc, nsrc)
+            (C, Cj) = _compute_filters(
+                G, D, candidate_permutations, dtype, with_C, with_Cj, pool
+            )
+
+        # second pass: energies of the frames, the consecutive frames that fit
+        # into a block being evaluated together
+        t = 0
+        while t < len(wins):
+            if wins[t].stop - wins[t].start > block_size:
+                s_r[..., t] = _bss_eval_long_frame(
+                    reference_sources,
+                    estimated_sources,
+                    wins[t],
+                    candidate_permutations,
+                    C,
+                    Cj,
+                    bsseval_sources_version,
+                    block_size,
+                    read,
+                    workspace,
+                    computed,
+                )
+                t += 1
+                continue
+            first = t
+            start = wins[first].start
+            while t < len(wins) and wins[t].stop - start <= block_size:
+                t += 1
+            stop = max(win.stop for win in wins[first:t])
+            s_r[..., first:t] = _bss_eval_fixed_filters(
+                read(reference_sources, start, stop),
+                read(estimated_sources, start, stop),
+                candidate_permutations,
+                C,
+                Cj,
+                [slice(win.start - start, win.stop - start) for win in wins[first:t]],
+                bsseval_sources_version,
+                workspace=workspace,
+                metrics=computed,
+                pool=pool,
+            )
+
+    return _select_ordering(s_r, compute_permutation, framewise_filters, metrics)
+
+
 # Helper functions
+def _compute_filters(
+    G, D, candidate_permutations, dtype, with_C=True, with_Cj=True, pool=None
+):
+    """Distortion filters from the references correlations G and the
+    correlations D of the estimates with the references:
+    * C, projection filters on all sources of all estimates
+    * Cj, projection filters on the true source of the (true source,
+      estimated source) pairs of candidate_permutations, zero for the others
+    both being cast to dtype. The filters that are not requested with
+    ``with_C`` and ``with_Cj`` are zero. The systems of C and of each true
+    source are solved in parallel by the threads of pool, if given."""
+    (nsrc, nchan, filters_len) = D.shape[:3]
+    (C, Cj) = _zero_filters(nsrc, nchan, filters_len, dtype)
+
+    def solve(jtrue, workspace):
+        if jtrue is None:
+            # compute the interference distortion filters of all estimates
+            # at once
+            return _compute_projection_filters(G, D)
+        # compute the projection filters for all combinations at once
+        jest = np.unique(candidate_permutations[:, jtrue])
+        return _compute_projection_filters(G[jtrue, jtrue], D[jtrue][:, :, jest])
+
+    tasks = ([None] if with_C else []) + list(range(nsrc if with_Cj else 0))
+    if pool is None:
+        pool = _SourcePool(1, None)
+    for jtrue, filters in zip(tasks, pool.map(solve, tasks)):
+        if jtrue is None:
+            C = filters.astype(dtype)
+        else:
+            Cj[jtrue, np.unique(candidate_permutations[:, jtrue]), 0] = filters
+    return (C, Cj)
+
+
+def _zero_filters(nsrc, nchan, filters_len, dtype):
+    """Zero filters C and Cj with the shapes given by ``_compute_filters``,
+    whose projections are zero"""
+    return (
+        np.zeros((nsrc, nsrc, nchan, filters_len, nchan), dtype=dtype),
+        np.zeros((nsrc, nsrc, 1, nchan, filters_len, nchan), dtype=dtype),
+    )
+
+
+def _computed_metrics(metrics, compute_permutation):
+    """Checks the names of the requested criteria, and returns those to be
+    computed, including the SIR to select the best permutation"""
+    metrics = tuple(metrics)
+    for metric in metrics:
+        if metric not in METRICS:
+            raise ValueError(
+                "Unknown metric {}, should be one of {}".format(metric, METRICS)
+            )
+    if compute_permutation and "SIR" not in metrics:
+        metrics += ("SIR",)
+    return metrics
+
+
+def _required_filters(bsseval_sources_version, metrics):
+    """Whether the energy terms of the criteria metrics need the projections
+    on all sources, with C, and on the true source, with Cj"""
+    terms = np.array(_energy_terms(bsseval_sources_version, metrics))
+    return (bool(np.any(terms[:, 3])), bool(np.any(terms[:, 2])))
+
+
+def _candidate_permutations(nsrc, compute_permutation):
+    """Orderings of the estimates whose (true source, estimated source) pairs
+    are evaluated. Returns ncandidates X nsrc"""
+    if compute_permutation:
+        # the cyclic shifts of the estimates cover all the (true source,
+        # estimated source) pairs, whose scores are needed to find the best
+        # ordering as an assignment problem
+        return (np.arange(nsrc)[:, None] + np.arange(nsrc)) % nsrc
+    return np.array(np.arange(nsrc))[None, :]
+
+
+def _select_ordering(s_r, compute_permutation, framewise_filters, metrics=METRICS):
+    """Selects the best ordering of the estimates given the criteria s_r
+    4 X nsrc X nsrc X nwin of all (true source, estimated source) pairs, and
+    returns the criteria of that ordering as ``bss_eval``, those that are not
+    in metrics being np.nan"""
+    (SDR, ISR, SIR, SAR) = list(range(4))
+    (nsrc, nwin) = (s_r.shape[1], s_r.shape[3])
+
+    # select the best ordering
+    if framewise_filters:
+        # if we have framewise filters, output one permutation for each window
+        mean_sir = s_r[SIR]
+    else:
+        # otherwise, output one permutation for the whole signal as the best
+        # average one
+        mean_sir = np.mean(s_r[SIR], axis=-1, keepdims=True)
+    dum = np.arange(nsrc)
+    popt = np.empty((nsrc, mean_sir.shape[-1]), dtype=int)
+    for t in range(mean_sir.shape[-1]):
+        popt[:, t] = (
+            _best_permutation(mean_sir[..., t]) if compute_permutation else dum
+        )
+
+    # now prepare the output
+    if not framewise_filters:
+        result = s_r[:, dum, popt[:, 0], :]
+    else:
+        result = np.empty((4, nsrc, nwin))
+        for m, t in itertools.product(list(range(4)), list(range(nwin))):
+            result[m, :, t] = s_r[m, dum, popt[:, t], t]
+    for m, metric in enumerate(METRICS):
+        if metric not in metrics:
+            result[m] = np.nan
+
+    return (result[SDR], result[ISR], result[SIR], result[SAR], popt)
+
+
 class Framing:
     """helper iterator class to do overlapped windowing"""
 
@@ -482,35 +1017,458 @@ class Framing:
     next = __next__
 
 
-def _bss_decomp_mtifilt(reference_sources, estimated_source, j, C, Cj):
-    """Decomposition of an estimated source image into four components
-    representing respectively the true source image, spatial (or filtering)
-    distortion, interference and artifacts, derived from the true source
-    images using multichannel time-invariant filters."""
-    filters_len = Cj.shape[-2]
+class Workspace:
+    """Buffers of the temporaries of ``bss_eval``, reused across frames,
+    sources and successive calls.
+
+    Each buffer is identified by a name and grows to the largest size that
+    was requested for it, so that evaluating frames and tracks of similar
+    lengths does not allocate new large arrays. A workspace must not be
+    shared by concurrent evaluations, the threads of ``bss_eval`` using the
+    workspaces of ``thread_workspaces``."""
+
+    def __init__(self):
+        self.buffers = {}
+        self.children = []
+
+    def empty(self, name, shape, dtype=np.float64):
+        """Uninitialized array of the given shape and dtype, that is a view
+        of the buffer ``name``. It is only valid until the next request of
+        the same buffer."""
+        dtype = np.dtype(dtype)
+        shape = tuple(int(n) for n in np.atleast_1d(shape))
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.size < nbytes:
+            buffer = np.empty(nbytes, dtype=np.uint8)
+            self.buffers[name] = buffer
+        return buffer[:nbytes].view(dtype).reshape(shape)
+
+    def zeros(self, name, shape, dtype=np.float64):
+        """Same as ``empty``, with the array filled with zeros"""
+        out = self.empty(name, shape, dtype)
+        out[...] = 0
+        return out
+
+    def thread_workspaces(self, threads):
+        """Workspaces of ``threads`` threads running in parallel, that are
+        kept along this one to be reused by the next evaluations"""
+        while len(self.children) < threads:
+            self.children.append(Workspace())
+        return self.children[:threads]
 
-    # zero pad
-    s_true = _zeropad(reference_sources[j], filters_len - 1, axis=0)
+    @property
+    def nbytes(self):
+        return sum(buffer.size for buffer in self.buffers.values()) + sum(
+            child.nbytes for child in self.children
+        )
 
-    # compute appropriate projections
-    e_spat = _project(reference_sources[j], Cj) - s_true
-    e_interf = _project(reference_sources, C) - s_true - e_spat
-    e_artif = -s_true - e_spat - e_interf
-    e_artif[: estimated_source.shape[0], :] += estimated_source
+    def clear(self):
+        """Releases all the buffers"""
+        self.buffers.clear()
+        self.children.clear()
+
+
+class _SourcePool:
+    """Runs the independent tasks of the sources, such as their filters
+    solves and projections, on a pool of ``threads`` threads. The Fourier
+    transforms and the solves release the GIL. Each thread uses its own
+    workspace of ``workspace.thread_workspaces``, the tasks being run in the
+    calling thread with ``workspace`` if ``threads`` is 1."""
+
+    def __init__(self, threads, workspace):
+        self.workspace = workspace
+        self.executor = None
+        if threads > 1:
+            self.executor = concurrent.futures.ThreadPoolExecutor(threads)
+            self.workspaces = queue.Queue()
+            for child in workspace.thread_workspaces(threads):
+                self.workspaces.put(child)
+
+    def map(self, function, items):
+        """Results of ``function(item, workspace)`` for all items"""
+        if self.executor is None:
+            return [function(item, self.workspace) for item in items]
+
+        def task(item):
+            workspace = self.workspaces.get()
+            try:
+                return function(item, workspace)
+            finally:
+                self.workspaces.put(workspace)
+
+        return list(self.executor.map(task, items))
+
+    def __enter__(self):
+        return self
 
-    return (s_true, e_spat, e_interf, e_artif)
+    def __exit__(self, *args):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def _best_permutation(sir):
+    """Ordering of the estimates with the best mean SIR, given the SIR of all
+    the (true source, estimated source) pairs as a nsrc X nsrc matrix.
+
+    This is solved as a linear assignment problem in polynomial time instead
+    of trying all the permutations. Infinite scores are clipped to a bound
+    larger than the sum of all the finite ones, and the identity is returned
+    when some scores are undefined, such as on silent frames.
+    Returns perm, estimate ``perm[j]`` corresponding to true source ``j``"""
+    nsrc = sir.shape[0]
+    if np.any(np.isnan(sir)):
+        return np.arange(nsrc)
+    finite = sir[np.isfinite(sir)]
+    bound = (nsrc + 1) * (np.max(np.abs(finite), initial=0) + 1)
+    _, perm = scipy.optimize.linear_sum_assignment(
+        np.clip(sir, -bound, bound), maximize=True
+    )
+    return perm
 
 
-def _zeropad(sig, N, axis=0):
-    """pads with N zeros at the end of the signal, along given axis"""
-    # ensures concatenation dimension is the first
-    sig = np.moveaxis(sig, axis, 0)
-    # zero pad
-    out = np.zeros((sig.shape[0] + N,) + sig.shape[1:])
-    out[: sig.shape[0], ...] = sig
-    # put back axis in place
-    out = np.moveaxis(out, 0, axis)
-    return out
+def _bss_eval_frame(
+    reference_sources,
+    estimated_sources,
+    candidate_permutations,
+    C,
+    Cj,
+    bsseval_sources_version,
+    workspace=None,
+    metrics=METRICS,
+    pool=None,
+):
+    """Criteria of all the (true source, estimated source) combinations of
+    candidate_permutations for one frame of the signals, from the energies of
+    the decompositions of the estimates given by ``_energy_terms``.
+    Only the energies needed by the criteria metrics are computed, the true
+    sources being decomposed in parallel by the threads of pool, if given.
+    The frame should be active, the callers skipping the silent frames with
+    the masks they already computed.
+    Returns a 4 X nsrc X nsrc array"""
+    (nsrc, nsampl, nchan) = reference_sources.shape
+    filters_len = C.shape[-2]
+    s_r = np.full((4, nsrc, nsrc), np.nan)
+
+    if workspace is None:
+        workspace = Workspace()
+    terms = _energy_terms(bsseval_sources_version, metrics)
+    shape = (nsampl + filters_len - 1, nchan)
+    dtype = np.result_type(reference_sources, C)
+    bounds = np.array([[0, shape[0]]])
+
+    def decompose(jtrue, workspace):
+        jests = np.unique(candidate_permutations[:, jtrue])
+        crit = np.full((4, len(jests)), np.nan)
+        for k, jest in enumerate(jests):
+            projj = _project(
+                reference_sources[jtrue],
+                Cj[jtrue, jest, 0],
+                out=workspace.empty("projj", shape, dtype),
+            )
+            proj = _project(
+                reference_sources, C[jest], out=workspace.empty("proj", shape, dtype)
+            )
+            energies = np.zeros((len(terms), 1))
+            _combination_energies(
+                (estimated_sources[jest], reference_sources[jtrue], projj, proj),
+                terms,
+                bounds,
+                energies,
+                workspace,
+            )
+            crit[:, k] = _bss_crit_energies(energies[:, 0], bsseval_sources_version)
+        return crit
+
+    if pool is None:
+        pool = _SourcePool(1, workspace)
+    for jtrue, crit in enumerate(pool.map(decompose, range(nsrc))):
+        s_r[:, jtrue, np.unique(candidate_permutations[:, jtrue])] = crit
+    return s_r
+
+
+def _combination_energies(signals, terms, bounds, out, workspace):
+    """Energies of the linear combinations ``terms`` (nterms X 4) of the
+    signals, that are the estimate, the true source image, and its projections
+    on the true source and on all sources, summed over the samples
+    ``bounds[t, 0]`` to ``bounds[t, 1]`` of each frame t. The estimate and the
+    true source image are zero after their end.
+    Results are added to out, nterms X nframes, using the buffers of
+    workspace"""
+    terms = np.asarray(terms, dtype=float)
+    (length, nchan) = signals[-1].shape
+    combination = workspace.empty("combination", (length, nchan))
+    # with a trailing zero for the frames ending at the end of the signals
+    power = workspace.empty("power", length + 1)
+    power[length] = 0
+    for k, coefs in enumerate(terms):
+        if not np.any(coefs):
+            # terms not needed by the criteria
+            continue
+        combination[...] = 0
+        for c, signal in zip(coefs, signals):
+            part = combination[: len(signal)]
+            if c == 1:
+                np.add(part, signal, out=part)
+            elif c == -1:
+                np.subtract(part, signal, out=part)
+            elif c:
+                part += c * signal
+        np.einsum("nc,nc->n", combination, combination, out=power[:length])
+        out[k] += np.add.reduceat(power, np.ravel(bounds))[::2]
+
+
+def _bss_eval_fixed_filters(
+    reference_sources,
+    estimated_sources,
+    candidate_permutations,
+    C,
+    Cj,
+    framer,
+    bsseval_sources_version,
+    active=None,
+    workspace=None,
+    metrics=METRICS,
+    pool=None,
+):
+    """Criteria of all the (true source, estimated source) combinations of
+    candidate_permutations for all frames, with time-invariant filters.
+
+    The decomposition of a frame is computed from the projections of the
+    signals restricted to that frame. Those only differ from the projections
+    of the whole signals over the filters_len - 1 samples that follow the
+    start and the end of the frame, because of the samples outside of the
+    frame. Each whole signal is hence projected only once, and the energies of
+    the components are obtained by reductions over the inner part of each frame,
+    plus the corrected boundaries. Frames shorter than the filters are
+    decomposed directly. The frames where all the sources are active can be
+    given as a boolean array ``active``, the others being silent. The
+    estimates are projected in parallel by the threads of pool, if given.
+    Returns a 4 X nsrc X nsrc X nwin array"""
+    (nsrc, nsampl, nchan) = reference_sources.shape
+    filters_len = C.shape[-2]
+    wins = list(framer)
+    nwin = len(wins)
+    s_r = np.full((4, nsrc, nsrc, nwin), np.nan)
+    if workspace is None:
+        workspace = Workspace()
+    if pool is None:
+        pool = _SourcePool(1, workspace)
+    if active is None:
+        active = np.all(
+            _signal_statistics(reference_sources, wins).active, axis=0
+        ) & np.all(_signal_statistics(estimated_sources, wins).active, axis=0)
+
+    # split frames between silent ones, short ones and the others
+    fast = np.zeros(nwin, dtype=bool)
+    for t, win in enumerate(wins):
+        if not active[t]:
+            continue
+        elif win.stop - win.start < filters_len:
+            s_r[..., t] = _bss_eval_frame(
+                reference_sources[:, win],
+                estimated_sources[:, win],
+                candidate_permutations,
+                C,
+                Cj,
+                bsseval_sources_version,
+                workspace,
+                metrics,
+                pool,
+            )
+        else:
+            fast[t] = True
+    if not np.any(fast):
+        return s_r
+    starts = np.array([win.start for win in wins])[fast]
+    stops = np.array([win.stop for win in wins])[fast]
+
+    # boundaries of the frames, and the filters_len - 1 samples before each
+    # frame and at each end, whose contributions to the whole projections
+    # leak into the frames
+    head = starts[:, None] + np.arange(filters_len - 1)
+    tail = stops[:, None] + np.arange(filters_len - 1)
+    before = _gather_frames(reference_sources, head - filters_len + 1)
+    after = _gather_frames(reference_sources, tail)
+    # reductions over the inner part of the frames
+    inner = np.stack((starts + filters_len - 1, stops), axis=1)
+
+    def energies(signals, terms, workspace):
+        """energies over all frames of the linear combinations ``terms`` of
+        the estimate, the true source, its projection on the true source and on
+        all sources"""
+        out = np.zeros((len(terms), len(starts)))
+        # the reductions over the inner parts are done on the whole signals
+        _combination_energies(signals[0], terms, inner, out, workspace)
+        for k, coefs in enumerate(terms):
+            if not any(coefs):
+                continue
+            (head_sigs, tail_sigs) = (
+                sum(c * sig for c, sig in zip(coefs, sigs) if c) for sigs in signals[1:]
+            )
+            out[k] += np.sum(head_sigs**2, axis=(-2, -1))
+            out[k] += np.sum(tail_sigs**2, axis=(-2, -1)) if np.ndim(tail_sigs) else 0
+        return out
+
+    terms = _energy_terms(bsseval_sources_version, metrics)
+    shape = (nsampl + filters_len - 1, nchan)
+    dtype = np.result_type(reference_sources, C)
+
+    def decompose(jest, workspace):
+        """criteria of the true sources paired with the estimate jest"""
+        crit = []
+        # projection on all sources
+        proj = _project(
+            reference_sources, C[jest], out=workspace.empty("proj", shape, dtype)
+        )
+        proj_head = proj[head] - _project_frames(before, C[jest])[:, filters_len - 1 :]
+        proj_tail = proj[tail] - _project_frames(after, C[jest])[:, : filters_len - 1]
+        for jtrue in np.flatnonzero(np.any(candidate_permutations == jest, axis=0)):
+            # projection on the true source
+            Cjj = Cj[jtrue, jest]
+            projj = _project(
+                reference_sources[jtrue],
+                Cjj[0],
+                out=workspace.empty("projj", shape, dtype),
+            )
+            projj_head = (
+                projj[head]
+                - _project_frames(before[:, jtrue : jtrue + 1], Cjj)[
+                    :, filters_len - 1 :
+                ]
+            )
+            projj_tail = (
+                projj[tail]
+                - _project_frames(after[:, jtrue : jtrue + 1], Cjj)[
+                    :, : filters_len - 1
+                ]
+            )
+
+            # the estimate and the true source are zero after the frames
+            signals = (
+                (
+                    estimated_sources[jest],
+                    reference_sources[jtrue],
+                    projj[:nsampl],
+                    proj[:nsampl],
+                ),
+                (
+                    estimated_sources[jest][head],
+                    reference_sources[jtrue][head],
+                    projj_head,
+                    proj_head,
+                ),
+                (0, 0, projj_tail, proj_tail),
+            )
+            crit.append(
+                (
+                    jtrue,
+                    _bss_crit_energies(
+                        energies(signals, terms, workspace), bsseval_sources_version
+                    ),
+                )
+            )
+        return crit
+
+    jests = np.unique(candidate_permutations)
+    for jest, crit in zip(jests, pool.map(decompose, jests)):
+        for jtrue, values in crit:
+            s_r[:, jtrue, jest, fast] = values
+    return s_r
+
+
+def _bss_eval_long_frame(
+    reference_sources,
+    estimated_sources,
+    win,
+    candidate_permutations,
+    C,
+    Cj,
+    bsseval_sources_version,
+    block_size,
+    read,
+    workspace=None,
+    metrics=METRICS,
+):
+    """Same as ``_bss_eval_frame`` for the frame ``win`` of the signals, with
+    the decomposition computed over blocks of the frame of at most block_size
+    samples, that are read with ``read(sources, start, stop)``.
+    Returns a 4 X nsrc X nsrc array"""
+    nsrc = reference_sources.shape[0]
+    filters_len = C.shape[-2]
+    if workspace is None:
+        workspace = Workspace()
+    terms = _energy_terms(bsseval_sources_version, metrics)
+    energies = np.zeros((len(terms), nsrc, nsrc, 1))
+    active = np.zeros((2, nsrc), dtype=bool)
+
+    # the decomposition spans filters_len - 1 samples after the frame
+    for start in range(win.start, win.stop + filters_len - 1, block_size):
+        stop = min(start + block_size, win.stop + filters_len - 1)
+        # references samples of the frame that are projected on the block
+        (lo, hi) = (max(start - filters_len + 1, win.start), min(stop, win.stop))
+        references = read(reference_sources, lo, hi)
+        estimates = np.zeros(
+            (nsrc, stop - start) + references.shape[2:], dtype=references.dtype
+        )
+        estimates[:, : max(hi - start, 0)] = read(estimated_sources, start, hi)
+        s_true = np.zeros_like(estimates)
+        s_true[:, : max(hi - start, 0)] = references[:, start - lo :]
+        active |= np.any(np.sum(np.stack((s_true, estimates)), axis=3) != 0, axis=2)
+
+        shape = (hi - lo + filters_len - 1,) + references.shape[2:]
+        dtype = np.result_type(references, C)
+        bounds = np.array([[0, stop - start]])
+        for jest in np.unique(candidate_permutations):
+            proj = _project(
+                references, C[jest], out=workspace.empty("proj", shape, dtype)
+            )[start - lo : stop - lo]
+            for jtrue in np.flatnonzero(np.any(candidate_permutations == jest, axis=0)):
+                Cjj = Cj[jtrue, jest, 0]
+                projj = _project(
+                    references[jtrue], Cjj, out=workspace.empty("projj", shape, dtype)
+                )[start - lo : stop - lo]
+                signals = (estimates[jest], s_true[jtrue], projj, proj)
+                _combination_energies(
+                    signals, terms, bounds, energies[:, jtrue, jest], workspace
+                )
+
+    s_r = np.full((4, nsrc, nsrc), np.nan)
+    # if we have a silent frame set results as np.nan
+    if not np.all(active):
+        return s_r
+    for jtrue in range(nsrc):
+        for jest in np.unique(candidate_permutations[:, jtrue]):
+            s_r[:, jtrue, jest] = _bss_crit_energies(
+                energies[:, jtrue, jest, 0], bsseval_sources_version
+            )
+    return s_r
+
+
+def _gather_frames(sources, idx):
+    """Gathers the samples of sources nsrc X nsampl X nchan at the indices
+    idx (nframes X length), that are zero outside of the signals.
+    Returns nframes X nsrc X length X nchan"""
+    nsampl = sources.shape[1]
+    frames = sources[:, np.clip(idx, 0, nsampl - 1)]
+    frames[:, (idx < 0) | (idx >= nsampl)] = 0
+    return np.moveaxis(frames, 0, 1)
+
+
+def _project_frames(frames, C):
+    """Project short frames using pre-computed filters C
+    frames are nframes X nsrc X length X nchan
+    C is nsrc X nchan X filters_len X nchan
+    Returns nframes X (length + filters_len - 1) X nchan
+    """
+    n_out = frames.shape[2] + C.shape[-2] - 1
+    if frames.shape[2] == 0 or not np.any(C):
+        return np.zeros((frames.shape[0], n_out, C.shape[-1]), dtype=frames.dtype)
+    n_fft = scipy.fft.next_fast_len(n_out, real=True)
+    ff = scipy.fft.rfft(frames, n=n_fft, axis=2)
+    cf = scipy.fft.rfft(C, n=n_fft, axis=2)
+    out = scipy.fft.irfft(np.einsum("tjfc,jcfd->tfd", ff, cf), n=n_fft, axis=1)
+    return out[:, :n_out]
 
 
 def _reshape_G(G):
@@ -524,93 +1482,536 @@ def _reshape_G(G):
     return G
 
 
-def _compute_reference_correlations(reference_sources, filters_len):
+def _toeplitz_from_lags(G):
+    """From lag-domain correlations of size ... X (2 * filters_len - 1),
+    creates the Toeplitz matrices of size ... X filters_len X filters_len"""
+    filters_len = (G.shape[-1] + 1) // 2
+    idx = np.arange(filters_len)[None, :] - np.arange(filters_len)[:, None]
+    return G[..., idx + filters_len - 1]
+
+
+def _compute_reference_correlations(reference_sources, filters_len, workspace=None):
     """Compute the inner products between delayed versions of reference_sources
     reference is nsrc X nsamp X nchan.
     Returns
-    * G, matrix : nsrc X nsrc X nchan X nchan X filters_len X filters_len
-    * sf, reference spectra: nsrc X nchan X filters_len"""
+    * G, lag-domain correlations : nsrc X nsrc X nchan X nchan X (2 * filters_len - 1)
+      where G[i, j, c1, c2, k + filters_len - 1] is the inner product between
+      channel c1 of source i and channel c2 of source j delayed by k samples.
+      The full matrix of delayed inner products is ``_toeplitz_from_lags(G)``.
+    * sf, reference spectra: nsrc X nchan X (n_fft // 2 + 1)"""
 
-    # reshape references as nsrc X nchan X nsampl
     (nsrc, nsampl, nchan) = reference_sources.shape
-    reference_sources = np.moveaxis(reference_sources, (1), (2))
 
-    # zero padding and FFT of references
-    reference_sources = _zeropad(reference_sources, filters_len - 1, axis=2)
-    n_fft = int(2 ** np.ceil(np.log2(nsampl + filters_len - 1.0)))
-    sf = scipy.fftpack.fft(reference_sources, n=n_fft, axis=2)
+    # real FFT of all zero padded references in one pass
+    n_fft = _fft_length(nsampl, filters_len)
+    sf = scipy.fft.rfft(_padded_channels(reference_sources, n_fft, workspace), axis=2)
 
-    # compute intercorrelation between sources
-    G = np.zeros((nsrc, nsrc, nchan, nchan, filters_len, filters_len))
-    for (i, c1), (j, c2) in itertools.combinations_with_replacement(
-        itertools.product(list(range(nsrc)), list(range(nchan))), 2
-    ):
-        ssf = sf[j, c2] * np.conj(sf[i, c1])
-        ssf = np.real(scipy.fftpack.ifft(ssf))
-        ss = toeplitz(np.hstack((ssf[0], ssf[-1:-filters_len:-1])), r=ssf[:filters_len])
-        G[j, i, c2, c1] = ss
-        G[i, j, c1, c2] = ss.T
+    # lag windows of the intercorrelations between all sources and channels
+    G = _compute_correlation_lags(
+        sf.reshape(nsrc * nchan, -1), n_fft, filters_len, symmetric=True
+    )
+    return _G_from_lags(G, nsrc), sf
+
+
+def _mix_reference_correlations(G, sf, mixing):
+    """References correlations G and spectra sf, as returned by
+    ``_compute_reference_correlations``, of the linear combinations
+    ``mixing @ reference_sources`` of the references, mixing being a
+    nmix X nsrc matrix. The correlations being bilinear and the Fourier
+    transform linear, they are combinations of those of the references."""
+    (nmix, nsrc) = mixing.shape
+    G = np.einsum("ia,jb,ab...->ij...", mixing, mixing, G).astype(G.dtype)
+    sf = (mixing.astype(sf.dtype) @ sf.reshape(nsrc, -1)).reshape(
+        (nmix,) + sf.shape[1:]
+    )
     return G, sf
 
 
-def _compute_projection_filters(G, sf, estimated_source):
-    """Least-squares projection of estimated source on the subspace spanned by
+def _compute_correlation_lags(xf, n_fft, filters_len, yf=None, symmetric=False):
+    """Lags ``-(filters_len - 1)`` to ``filters_len - 1`` of the circular
+    intercorrelations ``ifft(xf[p] * conj(yf[q]))`` between all rows of the
+    real spectra xf (M X nfreq) and yf (N X nfreq, defaults to xf).
+    Returns an M X N X (2 * filters_len - 1) array, lag k being at index
+    k + filters_len - 1.
+    If ``symmetric``, yf is xf and only the upper triangle is transformed."""
+    if yf is None:
+        yf = xf
+    lags = np.empty((xf.shape[0], yf.shape[0], 2 * filters_len - 1))
+    for p in range(xf.shape[0]):
+        # one batched inverse transform per row of xf
+        start = p if symmetric else 0
+        # the products of single precision spectra are transformed back in
+        # double precision
+        r = scipy.fft.irfft(
+            np.asarray(xf[p], dtype=np.complex128) * np.conj(yf[start:]),
+            n=n_fft,
+            axis=-1,
+        )
+        lags[p, start:, : filters_len - 1] = r[:, n_fft - filters_len + 1 :]
+        lags[p, start:, filters_len - 1 :] = r[:, :filters_len]
+        if symmetric:
+            lags[start + 1 :, p] = lags[p, start + 1 :, ::-1]
+    return lags
+
+
+def _mirror_lags(lags):
+    """Copy of the square lags array ``lags`` (M X M X (2 * filters_len - 1)),
+    as given by ``_compute_correlation_lags``, where lag -k of (q, p) is set
+    to lag k of (p, q) for all p <= q."""
+    lags = np.array(lags)
+    center = lags.shape[-1] // 2
+    for p in range(lags.shape[0]):
+        lags[p, p, :center] = lags[p, p, :center:-1]
+        lags[p + 1 :, p] = lags[p, p + 1 :, ::-1]
+    return lags
+
+
+def _solve_block_toeplitz(G, D, eps=0.0, tol=1e-12, maxiter=20):
+    """Solves the normal equations of the distortion filters using the
+    block-Toeplitz structure of the correlations, without building the
+    dense correlation matrix.
+
+    G are the lag-domain correlations nsrc X nsrc X nchan X nchan
+    X (2 * filters_len - 1) and D the right hand sides
+    nsrc X nchan X filters_len X nrhs, using the same ordering as
+    ``_reshape_G``. ``eps`` is added to the diagonal of the system.
+
+    The block Levinson recursion solves the system in O(filters_len**2)
+    block operations, but is only weakly stable for the badly conditioned
+    correlations of music signals. It is hence used as a preconditioner for
+    conjugate gradients, which recover the accuracy of a dense solver in a
+    few iterations.
+    Raises LinAlgError if the iterations do not converge."""
+    (nsrc, _, nchan) = G.shape[:3]
+    filters_len = D.shape[-2]
+    nrhs = D.shape[-1]
+    P = nsrc * nchan
+
+    # R[p, q, k + filters_len - 1] is the correlation between delays a and
+    # a + k of the flattened (source, channel) indices p and q
+    R = np.moveaxis(G, 2, 1).reshape(P, P, 2 * filters_len - 1)
+    R = R + eps * np.eye(P)[..., None] * (np.arange(R.shape[-1]) == filters_len - 1)
+    y = D.reshape(P, filters_len, nrhs)
+
+    # spectra of the correlations to apply the system with FFT convolutions
+    n_fft = scipy.fft.next_fast_len(3 * filters_len - 2, real=True)
+    Rf = scipy.fft.rfft(R, n=n_fft, axis=-1)
+
+    def matvec(x):
+        xf = scipy.fft.rfft(x[:, ::-1], n=n_fft, axis=1)
+        out = scipy.fft.irfft(np.einsum("pqf,qfm->pfm", Rf, xf), n=n_fft, axis=1)
+        return out[:, filters_len - 1 : 2 * filters_len - 1][:, ::-1]
+
+    # the recursion only depends on the correlations: it is run once, and its
+    # generators f and b give the inverse of the system with the block
+    # Gohberg-Semencul formula
+    #     L(f) f[0]^-1 L(f)^T - L(Zb) b[-1]^-1 L(Zb)^T
+    # where L(c) is the block lower triangular Toeplitz matrix with first
+    # block column c, and Zb is b delayed by one block
+    (f, b) = _levinson(R)
+    Zb = np.concatenate([np.zeros_like(b[:1]), b[:-1]])
+    n_gen = scipy.fft.next_fast_len(2 * filters_len - 1, real=True)
+    generators = [
+        (scipy.fft.rfft(f, n=n_gen, axis=0), np.linalg.inv(f[0]), 1),
+        (scipy.fft.rfft(Zb, n=n_gen, axis=0), np.linalg.inv(b[-1]), -1),
+    ]
+
+    def lower(cf, x):
+        # product of L(c) with x, as a truncated convolution
+        xf = scipy.fft.rfft(x, n=n_gen, axis=1)
+        out = scipy.fft.irfft(np.einsum("fpq,qfm->pfm", cf, xf), n=n_gen, axis=1)
+        return out[:, :filters_len]
+
+    def precond(r):
+        z = 0
+        for cf, c0, sign in generators:
+            # L(c)^T is L(c) with transposed blocks, applied backwards in time
+            u = lower(np.swapaxes(cf, 1, 2), r[:, ::-1])[:, ::-1]
+            z = z + sign * lower(cf, np.einsum("pq,qlm->plm", c0, u))
+        return z
+
+    # preconditioned conjugate gradients, one independent run per column
+    norm = np.sqrt(np.sum(y**2, axis=(0, 1)))
+    norm[norm == 0] = 1
+    x = np.zeros_like(y)
+    r = y
+    z = precond(r)
+    d = z
+    rz = np.sum(r * z, axis=(0, 1))
+    for _ in range(maxiter):
+        if np.all(np.sqrt(np.sum(r**2, axis=(0, 1))) <= tol * norm):
+            return x.reshape(nsrc, nchan, filters_len, nrhs)
+        Ad = matvec(d)
+        dAd = np.sum(d * Ad, axis=(0, 1))
+        if not np.all(np.isfinite(dAd)) or np.any(dAd <= 0):
+            break
+        alpha = rz / dAd
+        x = x + alpha * d
+        r = r - alpha * Ad
+        z = precond(r)
+        rz_new = np.sum(r * z, axis=(0, 1))
+        d = z + (rz_new / rz) * d
+        rz = rz_new
+    raise np.linalg.LinAlgError("Block-Toeplitz solver did not converge")
+
+
+def _levinson(R):
+    """Block Levinson recursion for the block-Toeplitz system whose block
+    (a, b) is ``R[..., b - a + filters_len - 1]``.
+
+    R is P X P X (2 * filters_len - 1). Returns the forward and backward
+    generators f and b, filters_len X P X P, that are the first and last
+    block columns of the inverse of the system."""
+    P = R.shape[0]
+    filters_len = (R.shape[-1] + 1) // 2
+
+    # Rt[:, k] is the block R[..., k] laid out so that consecutive blocks can
+    # be multiplied with stacked vectors in a single matrix product
+    Rt = np.ascontiguousarray(np.moveaxis(R, 2, 1))
+
+    # forward and backward vectors f and b solve the system of size n with
+    # the identity in the first and last block of the right hand side
+    eye = np.eye(P)
+    f = np.zeros((filters_len * P, P))
+    b = np.zeros((filters_len * P, P))
+    f[:P] = b[:P] = np.linalg.inv(Rt[:, filters_len - 1])
+
+    for n in range(1, filters_len):
+        # last block row of the system of size n + 1 without the diagonal
+        # block, and first block row without the diagonal block
+        last = Rt[:, filters_len - 1 - n : filters_len - 1].reshape(P, n * P)
+        first = Rt[:, filters_len : filters_len + n].reshape(P, n * P)
+        ef = last @ f[: n * P]
+        eb = first @ b[: n * P]
+
+        fa = np.linalg.inv(eye - eb @ ef)
+        bd = np.linalg.inv(eye - ef @ eb)
+        f_old = f[: n * P].copy()
+        f[: n * P] = f_old @ fa
+        f[P : (n + 1) * P] -= b[: n * P] @ (ef @ fa)
+        b[P : (n + 1) * P] = b[: n * P] @ bd
+        b[:P] = 0
+        b[: n * P] -= f_old @ (eb @ bd)
+
+    if not (np.all(np.isfinite(f)) and np.all(np.isfinite(b))):
+        raise np.linalg.LinAlgError("Block Levinson recursion broke down")
+    return f.reshape(filters_len, P, P), b.reshape(filters_len, P, P)
+
+
+def _G_from_lags(lags, nsrc):
+    """References correlations G from the lags of the intercorrelations
+    between all references channels, as given by ``_compute_correlation_lags``"""
+    nchan = lags.shape[0] // nsrc
+    G = lags.reshape(nsrc, nchan, nsrc, nchan, lags.shape[-1])
+    return np.moveaxis(G, 2, 1)
+
+
+def _D_from_lags(lags, nsrc, nest):
+    """Estimates correlations D from the lags of the intercorrelations between
+    all references channels and estimates channels, as given by
+    ``_compute_correlation_lags``"""
+    filters_len = (lags.shape[-1] + 1) // 2
+    nchan = lags.shape[0] // nsrc
+    D = lags[..., filters_len - 1 :: -1]
+    D = D.reshape(nsrc, nchan, nest, lags.shape[1] // nest, filters_len)
+    return np.moveaxis(D, 4, 2)
+
+
+def _sliding_correlations(
+    reference_sources,
+    estimated_sources,
+    framer,
+    filters_len,
+    active=None,
+    workspace=None,
+):
+    """Iterates over the windows of framer, yielding the window along with the
+    correlations G and D of the signals restricted to that window, as given by
+    ``_compute_reference_correlations`` and ``_compute_estimates_correlations``.
+
+    The signals are split into segments between consecutive window boundaries.
+    The correlations between each segment and the whole signals are computed
+    once, and the correlations of a window are kept as a running sum that
+    is updated by adding the segments entering the window and subtracting
+    the ones leaving it. The products across the window boundaries are then
+    removed. The cost per window hence scales with the hop size instead of
+    the window size.
+    When a boolean array ``active`` is given, the correlations of the
+    inactive windows are not computed, and yielded as ``None``."""
+    (nsrc, nsampl, nchan) = reference_sources.shape
+    nest = estimated_sources.shape[0]
+    wins = list(framer)
+    if active is None:
+        active = np.ones(len(wins), dtype=bool)
+    if workspace is None:
+        workspace = Workspace()
+    bounds = np.unique([win.start for win in wins] + [win.stop for win in wins])
+
+    def segment(start, stop):
+        # correlations of the references on [start, stop) with the whole
+        # references, delayed by up to filters_len - 1 samples in both ways
+        return _compute_boundary_correlations(
+            reference_sources,
+            estimated_sources,
+            filters_len,
+            (start - filters_len + 1, stop + filters_len - 1),
+            (start, stop),
+            workspace,
+        )
+
+    running = 0
+    segments = collections.deque()
+    (lo, hi) = (0, 0)
+    # start of the first active window from each window on
+    next_start = np.full(len(wins) + 1, np.inf)
+    for t in reversed(range(len(wins))):
+        next_start[t] = wins[t].start if active[t] else next_start[t + 1]
+
+    for t, win in enumerate(wins):
+        if not active[t] and win.stop - win.start < filters_len - 1:
+            yield win, None, None
+            continue
+        elif not active[t] and next_start[t + 1] >= win.stop:
+            # the segments of the window are not used by the next active one
+            running = 0
+            segments.clear()
+            (lo, hi) = (0, 0)
+            yield win, None, None
+            continue
+        elif win.stop - win.start < filters_len - 1:
+            # too short for the boundaries corrections, compute directly
+            G, sf = _compute_reference_correlations(
+                reference_sources[:, win], filters_len, workspace
+            )
+            D = _compute_estimates_correlations(
+                sf, estimated_sources[:, win], filters_len, workspace
+            )
+            yield win, G, D
+            continue
+
+        new_lo = np.searchsorted(bounds, win.start)
+        new_hi = np.searchsorted(bounds, win.stop)
+        if new_lo >= hi:
+            # no overlap with the previous window
+            running = 0
+            segments.clear()
+            (lo, hi) = (new_lo, new_lo)
+        for k in range(hi, new_hi):
+            segments.append(segment(bounds[k], bounds[k + 1]))
+            running = running + segments[-1]
+        for k in range(lo, new_lo):
+            running = running - segments.popleft()
+        (lo, hi) = (new_lo, new_hi)
+        if not active[t]:
+            yield win, None, None
+            continue
+
+        # remove the products with samples before the start (negative lags)
+        # and after the stop (positive lags) of the window
+        lags = running
+        if filters_len > 1:
+            lags = lags - _compute_boundary_correlations(
+                reference_sources,
+                estimated_sources,
+                filters_len,
+                (win.start - filters_len + 1, win.start),
+                (win.start, win.start + filters_len - 1),
+                workspace,
+            )
+            lags = lags - _compute_boundary_correlations(
+                reference_sources,
+                estimated_sources,
+                filters_len,
+                (win.stop, win.stop + filters_len - 1),
+                (win.stop - filters_len + 1, win.stop),
+                workspace,
+            )
+        # the updates leave rounding errors that differ between the lags of
+        # (p, q) and (q, p), the correlations of the references are hence
+        # rebuilt from their upper triangle to keep the system symmetric
+        G = _G_from_lags(_mirror_lags(lags[:, : nsrc * nchan]), nsrc)
+        yield win, G, _D_from_lags(lags[:, nsrc * nchan :], nsrc, nest)
+
+
+def _compute_boundary_correlations(
+    reference_sources,
+    estimated_sources,
+    filters_len,
+    x_bounds,
+    y_bounds,
+    workspace=None,
+):
+    """Lags -(filters_len - 1) to filters_len - 1 of the sums over n in
+    ``range(*y_bounds)`` of the products x[p, n + k] y[q, n], where x are the
+    references channels restricted to ``range(*x_bounds)`` and y are all the
+    references and estimates channels.
+    Returns nsrc*nchan X (nsrc + nest)*nchan X (2 * filters_len - 1)"""
+    (y_start, y_stop) = y_bounds
+    # positions of x relative to the first sample of y
+    (x_start, x_stop) = (x_bounds[0] - y_start, x_bounds[1] - y_start)
+
+    # the samples of x before y are stored at the end of the FFT buffer, that
+    # must be long enough for the negative lags not to wrap on the others
+    n_fft = scipy.fft.next_fast_len(
+        max(x_stop, y_stop - y_start + filters_len - 1) + filters_len - 1,
+        real=True,
+    )
+    if workspace is None:
+        workspace = Workspace()
+    # the buffers are in the precision of the signals
+    dtype = np.result_type(reference_sources, estimated_sources, np.float32)
+    nx = reference_sources.shape[0] * reference_sources.shape[2]
+    x = workspace.zeros("boundary_x", (nx, n_fft), dtype)
+    if x_stop > max(x_start, 0):
+        _channels(
+            reference_sources,
+            max(x_start, 0) + y_start,
+            x_stop + y_start,
+            out=x[:, max(x_start, 0) : x_stop],
+        )
+    if x_start < min(x_stop, 0):
+        _channels(
+            reference_sources,
+            x_start + y_start,
+            min(x_stop, 0) + y_start,
+            out=x[:, n_fft + x_start : n_fft + min(x_stop, 0)],
+        )
+
+    # references and estimates channels, zero padded
+    ny = nx + estimated_sources.shape[0] * estimated_sources.shape[2]
+    y = workspace.empty("boundary_y", (ny, n_fft), dtype)
+    _channels(reference_sources, y_start, y_stop, out=y[:nx, : y_stop - y_start])
+    _channels(estimated_sources, y_start, y_stop, out=y[nx:, : y_stop - y_start])
+    y[:, y_stop - y_start :] = 0
+    return _compute_correlation_lags(
+        scipy.fft.rfft(x),
+        n_fft,
+        filters_len,
+        yf=scipy.fft.rfft(y),
+    )
+
+
+def _channels(sources, start, stop, out=None):
+    """Samples start to stop of all the channels of sources nsrc X nsampl X
+    nchan, that are zero outside of the signals, written into out if given.
+    Returns nsrc*nchan X (stop - start)"""
+    (nsrc, nsampl, nchan) = sources.shape
+    if out is None:
+        out = np.empty((nsrc * nchan, stop - start))
+    channels = out.reshape(nsrc, nchan, stop - start)
+    (lo, hi) = (max(start, 0), min(stop, nsampl))
+    channels[..., : max(lo - start, 0)] = 0
+    channels[..., max(hi - start, 0) :] = 0
+    if hi > lo:
+        channels[..., lo - start : hi - start] = np.moveaxis(sources[:, lo:hi], 1, 2)
+    return out
+
+
+def _padded_channels(sources, n_fft, workspace=None):
+    """Channels of sources nsrc X nsampl X nchan in their floating point
+    precision, zero padded to n_fft samples, in the buffer of workspace if
+    given, so that single precision sources have single precision spectra.
+    Returns nsrc X nchan X n_fft"""
+    (nsrc, nsampl, nchan) = sources.shape
+    if workspace is None:
+        workspace = Workspace()
+    padded = workspace.empty(
+        "padded", (nsrc, nchan, n_fft), np.result_type(sources, np.float32)
+    )
+    padded[..., :nsampl] = np.moveaxis(sources, 1, 2)
+    padded[..., nsampl:] = 0
+    return padded
+
+
+def _fft_length(nsampl, filters_len):
+    """FFT length for the correlations of signals of nsampl samples with lags
+    up to filters_len - 1, as the smallest fast length without aliasing"""
+    return scipy.fft.next_fast_len(nsampl + filters_len - 1, real=True)
+
+
+def _compute_estimates_correlations(
+    sf, estimated_sources, filters_len, workspace=None
+):
+    """Compute the inner products between estimated_sources and delayed
+    versions of the references, given by their spectra sf as returned by
+    ``_compute_reference_correlations``.
+    estimated_sources is nest X nsampl X nchan, each of them being transformed
+    only once.
+    Returns D : nsrc X nchan X filters_len X nest X nchan"""
+    (nsrc, nchan) = sf.shape[:2]
+    (nest, nsampl, nchan_est) = estimated_sources.shape
+
+    # real FFT of all estimates with chan in second dimension
+    n_fft = _fft_length(nsampl, filters_len)
+    sef = scipy.fft.rfft(_padded_channels(estimated_sources, n_fft, workspace), axis=2)
+
+    # cross-correlations between all references and estimates channels, of
+    # which the filters need the lags 0, -1, ..., -(filters_len - 1)
+    D = _compute_correlation_lags(
+        sf.reshape(nsrc * nchan, -1),
+        n_fft,
+        filters_len,
+        yf=sef.reshape(nest * nchan_est, -1),
+    )
+    return _D_from_lags(D, nsrc, nest)
+
+
+def _compute_projection_filters(G, D):
+    """Least-squares projection of estimated sources on the subspace spanned by
     delayed versions of reference sources, with delays between 0 and
     filters_len-1
+
+    G are the references correlations and D the cross-correlations
+    nsrc X nchan X filters_len X nest X nchan of nest estimates with the
+    references. The system is factorized once and all estimates are solved
+    for as multiple right hand sides.
+    Returns C : nest X nsrc X nchan X filters_len X nchan
     """
     # epsilon
     eps = np.finfo(float).eps
 
-    # shapes
-    (nsampl, nchan) = estimated_source.shape
     # handles the case where we are calling this with only one source
-    # G should be nsrc X nsrc X nchan X nchan X filters_len X filters_len
-    # and sf should be nsrc X nchan X filters_len
-    if len(G.shape) == 4:
+    # G should be nsrc X nsrc X nchan X nchan X (2 * filters_len - 1)
+    # and D should be nsrc X nchan X filters_len X nest X nchan
+    if len(G.shape) == 3:
         G = G[None, None, ...]
-        sf = sf[None, ...]
-    nsrc = G.shape[0]
-    filters_len = G.shape[-1]
-
-    # zero pad estimates and put chan in first dimension
-    estimated_source = _zeropad(estimated_source.T, filters_len - 1, axis=1)
-
-    # compute its FFT
-    n_fft = int(2 ** np.ceil(np.log2(nsampl + filters_len - 1.0)))
-    sef = scipy.fftpack.fft(estimated_source, n=n_fft)
-
-    # compute the cross-correlations between sources and estimates
-    D = np.zeros((nsrc, nchan, filters_len, nchan))
-    for j, cj, c in itertools.product(
-        list(range(nsrc)), list(range(nchan)), list(range(nchan))
-    ):
-        ssef = sf[j, cj] * np.conj(sef[c])
-        ssef = np.real(scipy.fftpack.ifft(ssef))
-        D[j, cj, :, c] = np.hstack((ssef[0], ssef[-1:-filters_len:-1]))
-
-    # reshape matrices to build the filters
-    D = D.reshape(nsrc * nchan * filters_len, nchan)
-    G = _reshape_G(G)
+        D = D[None, ...]
+    (nsrc, nchan, filters_len, nest) = D.shape[:4]
+    D = D.reshape(nsrc, nchan, filters_len, nest * nchan)
 
     # Distortion filters
-    try:
-        C = np.linalg.solve(G + eps * np.eye(G.shape[0]), D).reshape(
-            nsrc, nchan, filters_len, nchan
-        )
-    except np.linalg.linalg.LinAlgError:
-        C = np.linalg.lstsq(G, D)[0].reshape(nsrc, nchan, filters_len, nchan)
+    C = None
+    if nsrc * nchan * filters_len >= STRUCTURED_SOLVER_MIN_SIZE:
+        try:
+            C = _solve_block_toeplitz(G, D, eps)
+        except np.linalg.LinAlgError:
+            pass
+    if C is None:
+        D = D.reshape(nsrc * nchan * filters_len, nest * nchan)
+        G = _reshape_G(_toeplitz_from_lags(G)) + eps * np.eye(D.shape[0])
+        try:
+            # G is a Gram matrix, hence positive (semi-)definite
+            C = scipy.linalg.cho_solve(scipy.linalg.cho_factor(G), D)
+        except np.linalg.LinAlgError:
+            try:
+                C = np.linalg.solve(G, D)
+            except np.linalg.LinAlgError:
+                C = np.linalg.lstsq(G, D, rcond=None)[0]
+    C = np.moveaxis(C.reshape(nsrc, nchan, filters_len, nest, nchan), 3, 0)
 
     # if we asked for one single reference source,
-    # return just a nchan X filters_len matrix
+    # return just a nest X nchan X filters_len X nchan matrix
     if nsrc == 1:
-        C = C[0]
+        C = C[:, 0]
     return C
 
 
-def _project(reference_sources, C):
+def _project(reference_sources, C, out=None):
     """Project images using pre-computed filters C
     reference_sources are nsrc X nsampl X nchan
     C is nsrc X nchan X filters_len X nchan
+    The projection (nsampl + filters_len - 1) X nchan is written into out if
+    given, such as a buffer of a ``Workspace``.
     """
     # shapes: ensure that input is 3d (comprising the source index)
     if len(reference_sources.shape) == 2:
@@ -620,38 +2021,75 @@ def _project(reference_sources, C):
     (nsrc, nsampl, nchan) = reference_sources.shape
     filters_len = C.shape[-2]
 
-    # zero pad
-    reference_sources = _zeropad(reference_sources, filters_len - 1, axis=1)
-    sproj = np.zeros((nchan, nsampl + filters_len - 1))
+    # the full convolutions are nsampl + filters_len - 1 samples long
+    if out is None:
+        out = np.empty(
+            (nsampl + filters_len - 1, nchan),
+            dtype=np.result_type(reference_sources, C),
+        )
+    out[...] = 0
+    if nsampl == 0 or not np.any(C):
+        # such as the filters that are not needed by the criteria
+        return out
 
     for j, cj, c in itertools.product(
         list(range(nsrc)), list(range(nchan)), list(range(nchan))
     ):
-        sproj[c] += fftconvolve(C[j, cj, :, c], reference_sources[j, :, cj])[
-            : nsampl + filters_len - 1
-        ]
-    return sproj.T
-
+        out[:, c] += oaconvolve(C[j, cj, :, c], reference_sources[j, :, cj])
+    return out
 
-def _bss_crit(s_true, e_spat, e_interf, e_artif, bsseval_sources_version):
-    """Measurement of the separation quality for a given source in terms of
-    filtered true source, interference and artifacts.
 
-    """
-    # energy ratios
+def _energy_terms(bsseval_sources_version, metrics=METRICS):
+    """Linear combinations of the estimate, the true source image, and its
+    projections on the true source and on all sources, whose energies are the
+    terms of the criteria computed by ``_bss_crit_energies``.
+    The terms that are not needed by the criteria metrics are zero."""
     if bsseval_sources_version:
-        s_filt = s_true + e_spat
-        energy_s_filt = np.sum(s_filt**2)
-        sdr = _safe_db(energy_s_filt, np.sum((e_interf + e_artif) ** 2))
-        isr = np.empty(sdr.shape) * np.nan
-        sir = _safe_db(energy_s_filt, np.sum(e_interf**2))
-        sar = _safe_db(np.sum((s_filt + e_interf) ** 2), np.sum(e_artif**2))
+        # s_filt, e_interf + e_artif, e_interf, s_filt + e_interf, e_artif
+        terms = (
+            (0, 0, 1, 0),
+            (1, 0, -1, 0),
+            (0, 0, -1, 1),
+            (0, 0, 0, 1),
+            (1, 0, 0, -1),
+        )
+        needed = {"SDR": (0, 1), "ISR": (), "SIR": (0, 2), "SAR": (3, 4)}
     else:
-        energy_s_true = np.sum((s_true) ** 2)
-        sdr = _safe_db(energy_s_true, np.sum((e_spat + e_interf + e_artif) ** 2))
-        isr = _safe_db(energy_s_true, np.sum(e_spat**2))
-        sir = _safe_db(np.sum((s_true + e_spat) ** 2), np.sum(e_interf**2))
-        sar = _safe_db(np.sum((s_true + e_spat + e_interf) ** 2), np.sum(e_artif**2))
+        # s_true, e_spat + e_interf + e_artif, e_spat, s_true + e_spat,
+        # e_interf, s_true + e_spat + e_interf, e_artif
+        terms = (
+            (0, 1, 0, 0),
+            (1, -1, 0, 0),
+            (0, -1, 1, 0),
+            (0, 0, 1, 0),
+            (0, 0, -1, 1),
+            (0, 0, 0, 1),
+            (1, 0, 0, -1),
+        )
+        needed = {"SDR": (0, 1), "ISR": (0, 2), "SIR": (3, 4), "SAR": (5, 6)}
+    needed = set(k for metric in metrics for k in needed[metric])
+    return tuple(
+        coefs if k in needed else (0, 0, 0, 0) for k, coefs in enumerate(terms)
+    )
+
+
+def _bss_crit_energies(energies, bsseval_sources_version):
+    """Measurement of the separation quality of an estimate in terms of
+    filtered true source, interference and artifacts, from the energies of
+    the terms given by ``_energy_terms``, possibly for several frames at
+    once. The criteria whose terms were not computed are meaningless."""
+    # the terms that were not computed are zero
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if bsseval_sources_version:
+            sdr = _safe_db(energies[0], energies[1])
+            isr = np.full(np.shape(sdr), np.nan)
+            sir = _safe_db(energies[0], energies[2])
+            sar = _safe_db(energies[3], energies[4])
+        else:
+            sdr = _safe_db(energies[0], energies[1])
+            isr = _safe_db(energies[0], energies[2])
+            sir = _safe_db(energies[3], energies[4])
+            sar = _safe_db(energies[5], energies[6])
 
     return (sdr, isr, sir, sar)
 
@@ -660,6 +2098,9 @@ def _safe_db(num, den):
     """Properly handle the potential +Inf db SIR instead of raising a
     RuntimeWarning.
     """
-    if den == 0:
-        return np.inf
-    return 10 * np.log10(num / den)
+    if np.ndim(den) == 0:
+        if den == 0:
+            return np.inf
+        return 10 * np.log10(num / den)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den == 0, np.inf, 10 * np.log10(num / den))
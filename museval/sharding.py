@@ -0,0 +1,129 @@
+import os
+import glob
+import shutil
+import pandas as pd
+from .aggregate import EvalStore
+
+
+def shard_tracks(tracks, index, count):
+    """Tracks of one shard out of `count`, for evaluations split over
+    several nodes.
+
+    The split is deterministic, whatever the order of the tracks, and
+    balanced by duration: the tracks are assigned from the longest to the
+    shortest one to the shard with the smallest total duration so far.
+
+    Parameters
+    ----------
+    tracks : List(Track)
+        musdb tracks, with a `name` and a `duration` in seconds
+    index : int
+        index of the shard, from `0` to `count - 1`
+    count : int
+        number of shards
+
+    Returns
+    -------
+    tracks : List(Track)
+        tracks of the shard, in their original order
+    """
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(
+            "The shard index should be in [0, {}), got {}".format(count, index)
+        )
+    totals = [0.0] * count
+    shards = {}
+    for track in sorted(tracks, key=lambda t: (-(t.duration or 0), t.name)):
+        shard = min(range(count), key=lambda k: (totals[k], k))
+        totals[shard] += track.duration or 0
+        shards[track.name] = shard
+    return [track for track in tracks if shards[track.name] == index]
+
+
+def merge_eval_dirs(paths, output_dir, tracks=None):
+    """Merges the json trees written by the shards of an evaluation into
+    `output_dir`
+
+    Parameters
+    ----------
+    paths : List(str)
+        output folders of the shards, such as `output_dir` of `eval_mus_dir`
+    output_dir : str
+        folder of the merged json files, with the same structure
+    tracks : List(str)
+        names of the tracks that should have been evaluated, defaults to
+        `None`, not checking that all of them were
+
+    Raises
+    ------
+    ValueError
+        if a track was evaluated by several shards, or if one of `tracks` was
+        not evaluated
+    """
+    files = {}
+    for path in paths:
+        for json_path in glob.glob(os.path.join(path, "**", "*.json"), recursive=True):
+            relative = os.path.relpath(json_path, path)
+            if relative in files:
+                raise ValueError(
+                    "{} was evaluated by several shards: {} and {}".format(
+                        relative, files[relative], path
+                    )
+                )
+            files[relative] = path
+    _check_coverage(
+        set(os.path.splitext(os.path.basename(f))[0] for f in files), tracks
+    )
+
+    for relative, path in files.items():
+        target = os.path.join(output_dir, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(os.path.join(path, relative), target)
+
+
+def merge_eval_stores(paths, output=None, tracks=None):
+    """Merges the pickled `EvalStore` dataframes of the shards of an
+    evaluation
+
+    Parameters
+    ----------
+    paths : List(str)
+        paths to the pickles saved by `EvalStore.save`
+    output : str
+        path of the merged pickle, defaults to `None`, not saving it
+    tracks : List(str)
+        names of the tracks that should have been evaluated, see
+        `merge_eval_dirs`
+
+    Returns
+    -------
+    scores : EvalStore
+        scores of all the tracks
+    """
+    store = EvalStore()
+    owners = {}
+    for path in paths:
+        df = pd.read_pickle(path)
+        for track in df["track"].unique() if len(df) else []:
+            if track in owners:
+                raise ValueError(
+                    "{} was evaluated by several shards: {} and {}".format(
+                        track, owners[track], path
+                    )
+                )
+            owners[track] = path
+        store.add_track(df)
+    _check_coverage(set(owners), tracks)
+
+    if output is not None:
+        store.save(output)
+    return store
+
+
+def _check_coverage(evaluated, tracks):
+    """raises a ValueError if some of the tracks were not evaluated"""
+    if tracks is None:
+        return
+    missing = sorted(set(tracks) - evaluated)
+    if missing:
+        raise ValueError("Tracks not evaluated by any shard: {}".format(missing))
@@ -37,7 +37,9 @@ if __name__ == "__main__":
         entry_points={
             'console_scripts': [
                 'museval=museval.cli:museval',
-                'bsseval=museval.cli:bsseval'
+                'bsseval=museval.cli:bsseval',
+                'museval-merge=museval.cli:merge',
+                'museval-cache=museval.cli:cache'
             ],
         },
         # Dependencies, this installs the entire Python scientific
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+import pytest
+import soundfile as sf
+from museval import audio
+
+
+@pytest.mark.parametrize("subtype", ["FLOAT", "DOUBLE"])
+def test_wav_memmap(tmp_path, subtype):
+    samples = np.random.uniform(-1, 1, (1000, 2))
+    path = str(tmp_path / "a.wav")
+    sf.write(path, samples, 44100, subtype=subtype)
+
+    mapped, rate = audio.load_audio(path, mmap=True)
+    assert isinstance(mapped, np.memmap)
+    assert rate == 44100
+    decoded, _ = sf.read(path, always_2d=True, dtype=mapped.dtype.name)
+    assert np.array_equal(mapped, decoded)
+
+
+def test_wav_memmap_pcm(tmp_path):
+    path = str(tmp_path / "a.wav")
+    sf.write(path, np.random.uniform(-1, 1, (1000, 2)), 44100, subtype="PCM_16")
+    assert audio._wav_memmap(path) is None
+
+    # integer samples are decoded
+    loaded, rate = audio.load_audio(path, mmap=True)
+    assert not isinstance(loaded, np.memmap)
+    assert np.array_equal(loaded, sf.read(path, always_2d=True)[0])
+
+
+def test_sidecar(tmp_path):
+    for target in ["vocals", "drums"]:
+        sf.write(
+            str(tmp_path / (target + ".wav")),
+            np.random.uniform(-1, 1, (1000, 2)),
+            44100,
+            subtype="PCM_16",
+        )
+    expected, _ = audio.load_estimates_dir(str(tmp_path))
+
+    estimates, rate = audio.load_estimates_dir(str(tmp_path), sidecar=True)
+    assert rate == 44100
+    assert os.path.exists(str(tmp_path / (audio.SIDECAR_NAME + ".npy")))
+    for target in expected:
+        assert isinstance(estimates[target], np.memmap)
+        assert np.array_equal(estimates[target], expected[target])
+
+    # the sidecar is rebuilt when an estimate changes
+    vocals = np.random.uniform(-1, 1, (800, 2))
+    sf.write(str(tmp_path / "vocals.wav"), vocals, 44100, subtype="FLOAT")
+    os.utime(str(tmp_path / "vocals.wav"), ns=(0, 0))
+    estimates, _ = audio.load_estimates_dir(str(tmp_path), sidecar=True)
+    assert np.array_equal(estimates["vocals"], vocals.astype(np.float32))
+    assert np.array_equal(estimates["drums"], expected["drums"])
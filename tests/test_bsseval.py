@@ -1,3 +1,4 @@
+import itertools
 import numpy as np
 import pytest
 import museval.metrics as metrics
@@ -88,6 +89,49 @@ def test_silent_input(references, estimates, is_framewise, is_sources, nb_win, n
         )
 
 
+def test_non_finite_input(references, estimates, is_framewise):
+    estimates[0, 10] = np.nan
+
+    with pytest.raises(ValueError):
+        metrics.bss_eval(references, estimates, framewise_filters=is_framewise)
+
+
+def test_signal_statistics(nb_sources, nb_channels):
+    sources = np.random.random((nb_sources, 1000, nb_channels))
+    sources[0, :450] = 0
+    sources[-1, 600:] = 0
+    wins = list(metrics.Framing(200, 150, 1000))
+
+    statistics = metrics._signal_statistics(sources, wins)
+    for t, win in enumerate(wins):
+        for j in range(nb_sources):
+            assert statistics.active[j, t] == (
+                not metrics._any_source_silent(sources[j : j + 1, win])
+            )
+    assert not np.any(statistics.silent)
+    assert np.all(statistics.finite)
+
+
+def test_silent_frames(references, estimates, is_framewise, is_sources):
+    references[0, :900] = 0
+    estimates[1, 1500:] = 0
+    kwargs = dict(
+        window=300,
+        hop=200,
+        filters_len=32,
+        framewise_filters=is_framewise,
+        bsseval_sources_version=is_sources,
+    )
+
+    result = metrics.bss_eval(references, estimates, **kwargs)
+    wins = list(metrics.Framing(300, 200, references.shape[1]))
+    for t, win in enumerate(wins):
+        silent = metrics._any_source_silent(
+            references[:, win]
+        ) or metrics._any_source_silent(estimates[:, win])
+        assert np.all(np.isnan(result[0][:, t])) == silent
+
+
 def test_metric(references, estimates, is_framewise, is_sources, nb_win, nb_hop):
     metrics.bss_eval(
         references,
@@ -112,3 +156,334 @@ def test_wrappers(references, estimates, is_framewise, is_sources, nb_win, nb_ho
             references,
             estimates,
         )
+
+
+def test_reference_correlations(nb_sources, nb_channels):
+    filters_len = 8
+    references = np.random.random((nb_sources, 100, nb_channels))
+    G, _ = metrics._compute_reference_correlations(references, filters_len)
+    G = metrics._toeplitz_from_lags(G)
+
+    # inner products between explicitly delayed versions of the references
+    padded = np.pad(references, ((0, 0), (0, filters_len - 1), (0, 0)))
+    delayed = np.stack(
+        [np.roll(padded, delay, axis=1) for delay in range(filters_len)], axis=-1
+    )
+    expected = np.einsum("inca,jndb->ijcdab", delayed, delayed)
+
+    assert np.allclose(G, expected)
+
+
+def test_single_precision_spectra(nb_sources, nb_channels):
+    filters_len = 8
+    references = np.random.random((nb_sources, 100, nb_channels))
+    expected, _ = metrics._compute_reference_correlations(references, filters_len)
+
+    # single precision references keep single precision buffers and spectra
+    workspace = metrics.Workspace()
+    G, sf = metrics._compute_reference_correlations(
+        references.astype(np.float32), filters_len, workspace
+    )
+    assert sf.dtype == np.complex64
+    assert workspace.buffers["padded"].nbytes == sf.shape[0] * sf.shape[1] * 4 * (
+        metrics._fft_length(100, filters_len)
+    )
+    assert np.allclose(G, expected, rtol=1e-4)
+
+
+def test_block_toeplitz_solver(nb_sources, nb_channels):
+    filters_len = 32
+    references = np.random.random((nb_sources, 500, nb_channels))
+    G, _ = metrics._compute_reference_correlations(references, filters_len)
+    D = np.random.random((nb_sources, nb_channels, filters_len, nb_channels))
+
+    C = metrics._solve_block_toeplitz(G, D)
+    expected = np.linalg.solve(
+        metrics._reshape_G(metrics._toeplitz_from_lags(G)),
+        D.reshape(-1, nb_channels),
+    )
+
+    assert np.allclose(C.reshape(-1, nb_channels), expected)
+
+
+def test_projection_filters_stacked(nb_sources, nb_channels):
+    filters_len = 16
+    references = np.random.random((nb_sources, 300, nb_channels))
+    estimates = np.random.random((nb_sources, 300, nb_channels))
+    G, sf = metrics._compute_reference_correlations(references, filters_len)
+    D = metrics._compute_estimates_correlations(sf, estimates, filters_len)
+
+    C = metrics._compute_projection_filters(G, D)
+    for j in range(nb_sources):
+        Dj = metrics._compute_estimates_correlations(
+            sf, estimates[j : j + 1], filters_len
+        )
+        assert np.allclose(D[..., j : j + 1, :], Dj)
+        assert np.allclose(C[j], metrics._compute_projection_filters(G, Dj)[0])
+
+
+@pytest.mark.parametrize("window, hop", [(300, 300), (400, 150), (20, 250)])
+def test_fixed_filters_frames(nb_sources, nb_channels, is_sources, window, hop):
+    filters_len = 32
+    references = np.random.random((nb_sources, 1000, nb_channels))
+    estimates = np.random.random((nb_sources, 1000, nb_channels))
+    perms = np.arange(nb_sources)[None, :]
+
+    G, sf = metrics._compute_reference_correlations(references, filters_len)
+    D = metrics._compute_estimates_correlations(sf, estimates, filters_len)
+    C = metrics._compute_projection_filters(G, D)
+    Cj = np.stack(
+        [
+            metrics._compute_projection_filters(G[j, j], D[j])[:, None]
+            for j in range(nb_sources)
+        ]
+    )
+
+    s_r = metrics._bss_eval_fixed_filters(
+        references,
+        estimates,
+        perms,
+        C,
+        Cj,
+        metrics.Framing(window, hop, 1000),
+        is_sources,
+    )
+    for t, win in enumerate(metrics.Framing(window, hop, 1000)):
+        expected = metrics._bss_eval_frame(
+            references[:, win], estimates[:, win], perms, C, Cj, is_sources
+        )
+        assert np.allclose(s_r[..., t], expected, equal_nan=True)
+
+
+@pytest.mark.parametrize(
+    "window, hop", [(300, 300), (400, 150), (400, 70), (20, 250), (500, 600)]
+)
+def test_sliding_correlations(nb_sources, nb_channels, window, hop):
+    filters_len = 32
+    references = np.random.random((nb_sources, 1000, nb_channels))
+    estimates = np.random.random((nb_sources, 1000, nb_channels))
+
+    framer = metrics.Framing(window, hop, 1000)
+    correlations = metrics._sliding_correlations(
+        references, estimates, framer, filters_len
+    )
+    for win, G, D in correlations:
+        expected_G, sf = metrics._compute_reference_correlations(
+            references[:, win], filters_len
+        )
+        expected_D = metrics._compute_estimates_correlations(
+            sf, estimates[:, win], filters_len
+        )
+        assert np.allclose(G, expected_G)
+        assert np.allclose(D, expected_D)
+
+
+def test_sliding_correlations_duplicate_channels():
+    # identical channels make the correlations singular, which only the
+    # structured solver handles when they are exactly symmetric
+    window = 4000
+    references = np.random.random((2, 3 * window, 1)).repeat(2, axis=-1)
+    estimates = references + 0.3 * np.random.random(references.shape)
+
+    framer = metrics.Framing(window, window, references.shape[1])
+    for win, G, D in metrics._sliding_correlations(
+        references, estimates, framer, 512
+    ):
+        assert np.array_equal(G, np.swapaxes(np.swapaxes(G, 0, 1), 2, 3)[..., ::-1])
+
+    scores = metrics.bss_eval(
+        references, estimates, window=window, hop=window, framewise_filters=True
+    )
+    for t, win in enumerate(framer):
+        expected = metrics.bss_eval(
+            references[:, win],
+            estimates[:, win],
+            window=np.inf,
+            hop=np.inf,
+            framewise_filters=True,
+        )
+        for score, expected_score in zip(scores[:4], expected[:4]):
+            assert np.allclose(score[:, t], expected_score[:, 0], atol=1e-6)
+
+
+def test_fft_workers(references, estimates, is_framewise):
+    expected = metrics.bss_eval(
+        references, estimates, window=1000, hop=1000, framewise_filters=is_framewise
+    )
+    result = metrics.bss_eval(
+        references,
+        estimates,
+        window=1000,
+        hop=1000,
+        framewise_filters=is_framewise,
+        workers=2,
+    )
+    for a, b in zip(expected, result):
+        assert np.allclose(a, b, equal_nan=True)
+
+
+@pytest.mark.parametrize("nb_perm_sources", [3, 4])
+def test_best_permutation(nb_perm_sources, is_framewise):
+    references = np.random.random((nb_perm_sources, 4000, 2))
+    order = np.random.permutation(nb_perm_sources)
+    estimates = (
+        references[order] + 0.2 * np.random.random((nb_perm_sources, 4000, 2))
+    )
+
+    (sdr, isr, sir, sar, perm) = metrics.bss_eval(
+        references,
+        estimates,
+        window=2000,
+        hop=2000,
+        compute_permutation=True,
+        filters_len=32,
+        framewise_filters=is_framewise,
+    )
+    assert np.all(perm == np.argsort(order)[:, None])
+
+    # exhaustive search over all the permutations
+    sir = np.random.randn(nb_perm_sources, nb_perm_sources)
+    best = max(
+        itertools.permutations(range(nb_perm_sources)),
+        key=lambda p: np.mean(sir[np.arange(nb_perm_sources), p]),
+    )
+    assert np.all(metrics._best_permutation(sir) == best)
+
+
+def test_best_permutation_undefined():
+    sir = np.array([[np.inf, 3.0], [-np.inf, 1.0]])
+    assert np.all(metrics._best_permutation(sir) == [0, 1])
+    sir = np.array([[0.0, np.inf], [np.inf, 1.0]])
+    assert np.all(metrics._best_permutation(sir) == [1, 0])
+    sir[0, 0] = np.nan
+    assert np.all(metrics._best_permutation(sir) == [0, 1])
+
+
+@pytest.mark.parametrize("block_size", [700, 100000])
+@pytest.mark.parametrize(
+    "window, hop", [(1000, 1000), (1500, 700), (np.inf, np.inf), (20, 500)]
+)
+def test_streaming(tmp_path, is_framewise, is_sources, block_size, window, hop):
+    references = np.random.random((2, 4000, 2))
+    estimates = np.random.random((2, 4000, 2))
+    estimates[1, 1000:2000] = 0
+    kwargs = dict(
+        window=window,
+        hop=hop,
+        filters_len=32,
+        framewise_filters=is_framewise,
+        bsseval_sources_version=is_sources,
+    )
+    expected = metrics.bss_eval(references, estimates, **kwargs)
+
+    np.save(str(tmp_path / "references.npy"), references)
+    np.save(str(tmp_path / "estimates.npy"), estimates)
+    result = metrics.bss_eval_streaming(
+        np.load(str(tmp_path / "references.npy"), mmap_mode="r"),
+        np.load(str(tmp_path / "estimates.npy"), mmap_mode="r"),
+        block_size=block_size,
+        **kwargs
+    )
+    for a, b in zip(expected, result):
+        assert np.allclose(a, b, equal_nan=True)
+
+
+def test_workspace(references, estimates, is_framewise):
+    workspace = metrics.Workspace()
+    buffer = workspace.empty("buffer", (10, 2))
+    assert workspace.empty("buffer", (5, 3), np.float32).base is buffer.base
+    assert np.all(workspace.zeros("buffer", 4) == 0)
+
+    kwargs = dict(window=1000, hop=500, filters_len=32, framewise_filters=is_framewise)
+    expected = metrics.bss_eval(references, estimates, **kwargs)
+    for _ in range(2):
+        result = metrics.bss_eval(references, estimates, workspace=workspace, **kwargs)
+        for a, b in zip(expected, result):
+            assert np.allclose(a, b)
+    # buffers are reused by the next evaluations
+    nbytes = workspace.nbytes
+    metrics.bss_eval(references, estimates, workspace=workspace, **kwargs)
+    assert workspace.nbytes == nbytes
+
+
+@pytest.mark.parametrize(
+    "subset", [("SDR",), ("ISR",), ("SIR",), ("SAR",), ("SDR", "SAR")]
+)
+@pytest.mark.parametrize("is_streaming", [True, False])
+def test_metrics_subset(is_framewise, is_sources, subset, is_streaming):
+    references = np.random.random((2, 3000, 2))
+    estimates = references + 0.5 * np.random.random((2, 3000, 2))
+    kwargs = dict(
+        window=1000,
+        hop=1000,
+        filters_len=32,
+        framewise_filters=is_framewise,
+        bsseval_sources_version=is_sources,
+        compute_permutation=True,
+    )
+    expected = metrics.bss_eval(references, estimates, **kwargs)
+    if is_streaming:
+        result = metrics.bss_eval_streaming(
+            references, estimates, block_size=1500, metrics=subset, **kwargs
+        )
+    else:
+        result = metrics.bss_eval(references, estimates, metrics=subset, **kwargs)
+
+    assert np.array_equal(expected[4], result[4])
+    for metric, a, b in zip(metrics.METRICS, expected, result):
+        if metric in subset:
+            assert np.allclose(a, b, equal_nan=True)
+        else:
+            assert np.all(np.isnan(b))
+
+
+def test_metrics_unknown(references, estimates):
+    with pytest.raises(ValueError):
+        metrics.bss_eval(references, estimates, metrics=("PESQ",))
+
+
+@pytest.mark.parametrize("compute_permutation", [True, False])
+def test_multiresolution(is_framewise, is_sources, compute_permutation):
+    references = np.random.random((2, 6000, 2))
+    estimates = references + 0.5 * np.random.random((2, 6000, 2))
+    references[1, 1000:2500] = 0
+    resolutions = [(1000, 1000), (np.inf, 1000), (1500, 700), (20, 1000)]
+    kwargs = dict(
+        filters_len=32,
+        framewise_filters=is_framewise,
+        bsseval_sources_version=is_sources,
+        compute_permutation=compute_permutation,
+    )
+    result = metrics.bss_eval_multiresolution(
+        references, estimates, resolutions, **kwargs
+    )
+    assert len(result) == len(resolutions)
+    for (window, hop), scores in zip(resolutions, result):
+        expected = metrics.bss_eval(references, estimates, window, hop, **kwargs)
+        for a, b in zip(expected, scores):
+            assert a.shape == b.shape
+            assert np.allclose(a, b, equal_nan=True)
+
+
+@pytest.mark.parametrize("is_streaming", [True, False])
+def test_threads(is_framewise, is_sources, is_streaming):
+    references = np.random.random((3, 4000, 2))
+    estimates = references + 0.5 * np.random.random((3, 4000, 2))
+    kwargs = dict(
+        window=1000,
+        hop=700,
+        filters_len=32,
+        framewise_filters=is_framewise,
+        bsseval_sources_version=is_sources,
+        compute_permutation=True,
+    )
+    if is_streaming:
+        kwargs["block_size"] = 1500
+    evaluate = metrics.bss_eval_streaming if is_streaming else metrics.bss_eval
+    expected = evaluate(references, estimates, **kwargs)
+    workspace = metrics.Workspace()
+    result = evaluate(references, estimates, threads=3, workspace=workspace, **kwargs)
+    for a, b in zip(expected, result):
+        assert np.array_equal(a, b, equal_nan=True)
+    # each thread has its own buffers
+    assert len(workspace.children) == 3
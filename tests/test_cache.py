@@ -0,0 +1,200 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import museval
+import museval.metrics as metrics
+import soundfile as sf
+from museval import cli
+from museval.cache import ReferenceCache, ResultCache, StemCache
+
+
+@pytest.fixture
+def signals():
+    references = np.random.random((2, 4000, 2))
+    estimates = references + 0.5 * np.random.random((2, 4000, 2))
+    return references, estimates
+
+
+def test_reference_cache(tmp_path, signals, monkeypatch):
+    references, estimates = signals
+    expected = museval.evaluate(references, estimates, win=1000, hop=1000)
+
+    cache = ReferenceCache(str(tmp_path))
+    result = museval.evaluate(
+        references, estimates, win=1000, hop=1000, reference_cache=cache
+    )
+    assert len(os.listdir(str(tmp_path))) == 1
+    for a, b in zip(expected, result):
+        assert np.allclose(a, b)
+
+    # the references correlations are now loaded from the cache
+    def fail(*args):
+        raise AssertionError("reference correlations recomputed")
+
+    monkeypatch.setattr(metrics, "_compute_reference_correlations", fail)
+    result = museval.evaluate(
+        references, estimates, win=1000, hop=1000, reference_cache=str(tmp_path)
+    )
+    for a, b in zip(expected, result):
+        assert np.allclose(a, b)
+
+
+def test_reference_cache_eval_mus_dir(tmp_path, monkeypatch):
+    pytest.importorskip("musdb")
+    for root in ("musdb", "estimates"):
+        track_dir = tmp_path / root / "test" / "A - a"
+        track_dir.mkdir(parents=True)
+        for target in ("vocals", "drums", "bass", "other", "mixture"):
+            if root == "estimates" and target not in ("vocals", "drums"):
+                continue
+            sf.write(
+                str(track_dir / (target + ".wav")),
+                np.random.random((8000, 2)) - 0.5,
+                8000,
+            )
+    args = [
+        str(tmp_path / "estimates"),
+        "--musdb",
+        str(tmp_path / "musdb"),
+        "--is-wav",
+        "--metrics",
+        "SIR",
+        "--reference-cache",
+        str(tmp_path / "cache"),
+    ]
+    cli.museval(args + ["-o", str(tmp_path / "scores")])
+    assert len(os.listdir(str(tmp_path / "cache"))) == 1
+
+    # the other evaluations of the same references load their correlations
+    def fail(*args):
+        raise AssertionError("reference correlations recomputed")
+
+    monkeypatch.setattr(metrics, "_compute_reference_correlations", fail)
+    cli.museval(args + ["-o", str(tmp_path / "cached")])
+    assert (tmp_path / "cached" / "test" / "A - a.json").read_text() == (
+        tmp_path / "scores" / "test" / "A - a.json"
+    ).read_text()
+
+
+def test_reference_cache_key(tmp_path, signals):
+    references, _ = signals
+    cache = ReferenceCache(str(tmp_path))
+    key = cache.key(references, 512)
+    assert key == cache.key(references.copy(), 512)
+    assert key != cache.key(references, 256)
+    references[0, 0, 0] += 1
+    assert key != cache.key(references, 512)
+
+
+def test_reference_cache_eviction(tmp_path):
+    cache = ReferenceCache(str(tmp_path), max_size=3 * 8000 + 500)
+    for k in range(4):
+        cache.save("bundle%d" % k, x=np.zeros(1000))
+        os.utime(os.path.join(str(tmp_path), "bundle%d" % k), (k, k))
+        cache.evict()
+    assert sorted(os.listdir(str(tmp_path))) == ["bundle1", "bundle2", "bundle3"]
+    assert cache.load("bundle0") is None
+    assert np.all(cache.load("bundle3")["x"] == 0)
+
+
+def test_result_cache(tmp_path, monkeypatch, capsys):
+    for name in ("references", "estimates", "copy"):
+        (tmp_path / name).mkdir()
+    for target in ("vocals", "drums"):
+        audio = np.random.random((8000, 2)) - 0.5
+        # a silent frame, whose scores are undefined
+        audio[-4000:] = 0
+        sf.write(str(tmp_path / "references" / (target + ".wav")), audio, 8000)
+        for name in ("estimates", "copy"):
+            sf.write(
+                str(tmp_path / name / (target + ".wav")),
+                audio + 0.1 * np.random.RandomState(0).random_sample((8000, 2)),
+                8000,
+            )
+    kwargs = dict(win=0.5, hop=0.5, result_cache=str(tmp_path / "cache"))
+    expected = museval.eval_dir(
+        str(tmp_path / "references"), str(tmp_path / "estimates"), **kwargs
+    )
+    assert len(ResultCache(str(tmp_path / "cache")).entries()) == 1
+
+    # identical estimates are not evaluated again
+    def fail(*args, **kwargs):
+        raise AssertionError("scores recomputed")
+
+    monkeypatch.setattr(museval, "_evaluate_scores", fail)
+    result = museval.eval_dir(
+        str(tmp_path / "references"), str(tmp_path / "copy"), **kwargs
+    )
+    assert result.json == expected.json
+    # with the same types as the fresh scores
+    assert repr(result.scores) == repr(expected.scores)
+    pd.testing.assert_frame_equal(result.df, expected.df)
+    with pytest.raises(AssertionError):
+        museval.eval_dir(
+            str(tmp_path / "references"),
+            str(tmp_path / "copy"),
+            **dict(kwargs, metrics=("SDR",))
+        )
+
+    cli.cache([str(tmp_path / "cache"), "list"])
+    assert "1 results" in capsys.readouterr().out
+    cli.cache([str(tmp_path / "cache"), "prune", "--older-than", "1"])
+    assert len(ResultCache(str(tmp_path / "cache")).entries()) == 1
+    cli.cache([str(tmp_path / "cache"), "clear"])
+    assert not ResultCache(str(tmp_path / "cache")).entries()
+
+
+def test_stem_cache(tmp_path):
+    musdb = pytest.importorskip("musdb")
+    track_dir = tmp_path / "musdb" / "test" / "A - a"
+    track_dir.mkdir(parents=True)
+    for target in ("vocals", "drums", "bass", "other", "mixture"):
+        sf.write(
+            str(track_dir / (target + ".wav")),
+            np.random.random((8000, 2)) - 0.5,
+            8000,
+            subtype="PCM_16",
+        )
+    track = musdb.DB(root=str(tmp_path / "musdb"), is_wav=True)[0]
+    stem_cache = StemCache(str(tmp_path / "stems"))
+
+    for target in ("vocals", "accompaniment"):
+        expected = track.targets[target].audio
+        stem_cache.audio(track, target)
+        audio = stem_cache.audio(track, target)
+        assert isinstance(audio, np.memmap)
+        assert audio.dtype == np.float32
+        assert np.array_equal(audio, expected)
+
+    # the scores do not depend on the cache
+    estimates = {
+        "vocals": track.targets["vocals"].audio + 0.1,
+        "accompaniment": track.targets["accompaniment"].audio - 0.1,
+    }
+    kwargs = dict(win=0.5, hop=0.5, metrics=("SDR",))
+    expected = museval.eval_mus_track(track, estimates, **kwargs)
+    result = museval.eval_mus_track(
+        track, estimates, stem_cache=str(tmp_path / "stems"), **kwargs
+    )
+    assert result.json == expected.json
+
+    # no temporary files are left, and the audio is only read along with
+    # its signature
+    track_cache = tmp_path / "stems" / "test" / "A - a"
+    assert sorted(os.listdir(str(track_cache))) == [
+        "accompaniment.json",
+        "accompaniment.npy",
+        "vocals.json",
+        "vocals.npy",
+    ]
+    (track_cache / "vocals.json").unlink()
+    signature = stem_cache.signature(track, "vocals")
+    assert stem_cache.load(track, "vocals", signature) is None
+
+    # changed stems are decoded again
+    sf.write(str(track_dir / "bass.wav"), np.zeros((8000, 2)), 8000)
+    assert np.array_equal(
+        stem_cache.audio(track, "accompaniment"),
+        track.targets["drums"].audio + track.targets["other"].audio,
+    )
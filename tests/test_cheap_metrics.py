@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import museval
+from museval import cheap_metrics, metrics
+
+
+def naive_scores(references, estimates, window, hop):
+    wins = list(metrics.Framing(window, hop, references.shape[1]))
+    scores = {
+        name: np.full((len(references), len(wins)), np.nan)
+        for name in cheap_metrics.METRICS
+    }
+    for j, (s, e) in enumerate(zip(references, estimates)):
+        for t, win in enumerate(wins):
+            (s_t, e_t) = (s[win].ravel(), e[win].ravel())
+            if not np.any(s_t):
+                continue
+            target = np.dot(e_t, s_t) / np.dot(s_t, s_t) * s_t
+            scores["SI-SDR"][j, t] = 10 * np.log10(
+                np.sum(target**2) / np.sum((e_t - target) ** 2)
+            )
+            scores["SNR"][j, t] = 10 * np.log10(
+                np.sum(s_t**2) / np.sum((s_t - e_t) ** 2)
+            )
+    return scores
+
+
+@pytest.mark.parametrize("window, hop", [(1000, 1000), (1500, 700), (20, 1000)])
+@pytest.mark.parametrize("block_size", [333, 2**16])
+def test_cheap_eval(window, hop, block_size):
+    references = np.random.random((3, 4000, 2)) - 0.5
+    estimates = 2 * references + 0.5 * np.random.random((3, 4000, 2))
+    references[1, 500:1500] = 0
+
+    expected = naive_scores(references, estimates, window, hop)
+    scores = cheap_metrics.cheap_eval(
+        references, estimates, window=window, hop=hop, block_size=block_size
+    )
+    assert set(scores) == set(cheap_metrics.METRICS)
+    for name in cheap_metrics.METRICS:
+        assert np.allclose(scores[name], expected[name], equal_nan=True)
+
+    subset = cheap_metrics.cheap_eval(
+        references, estimates, window=window, hop=hop, metrics=("SNR",)
+    )
+    assert list(subset) == ["SNR"]
+    with pytest.raises(ValueError):
+        cheap_metrics.cheap_eval(references, estimates, metrics=("SDR",))
+
+
+def test_cheap_eval_streaming():
+    references = np.random.random((2, 5000, 2))
+    estimates = references + 0.1 * np.random.random((2, 5000, 2))
+    expected = museval.evaluate(references, estimates, win=1000, hop=1000)
+
+    (scores,) = museval._evaluate_scores(
+        references, estimates, [(1000, 1000)], metrics=("SDR", "SI-SDR")
+    )
+    assert list(scores) == ["SDR", "SI-SDR"]
+    assert np.allclose(scores["SDR"], expected[0])
+
+    (streamed,) = museval._evaluate_scores(
+        museval.AudioSources(references),
+        museval.AudioSources(estimates),
+        [(1000, 1000)],
+        block_size=700,
+        metrics=("SI-SDR", "SNR"),
+    )
+    expected = cheap_metrics.cheap_eval(references, estimates, window=1000, hop=1000)
+    for name in ("SI-SDR", "SNR"):
+        assert np.allclose(streamed[name], expected[name])
+    assert np.allclose(streamed["SI-SDR"], scores["SI-SDR"])
@@ -2,6 +2,7 @@ import numpy as np
 import pytest
 import museval.metrics as metrics
 import museval
+import soundfile as sf
 
 
 @pytest.fixture(params=[2])
@@ -32,3 +33,156 @@ def test_pad_or_truncate(nb_sources, nb_channels, nb_samples, nb_samples_diff):
 
     references, estimates = museval.pad_or_truncate(references, estimates)
     assert references.shape[1] == estimates.shape[1]
+
+
+def test_precision_deviation(nb_sources, nb_channels):
+    references = np.random.random((nb_sources, 44100, nb_channels))
+    estimates = references + 0.3 * np.random.random((nb_sources, 44100, nb_channels))
+
+    deviations = museval.precision_deviation(
+        references, estimates, win=22050, hop=22050, dtype=np.float32
+    )
+    assert set(deviations) == {"SDR", "ISR", "SIR", "SAR"}
+    for deviation in deviations.values():
+        assert deviation < 1e-2
+
+
+def test_evaluate_blocks(tmp_path, nb_sources, nb_channels):
+    references = np.random.random((nb_sources, 10000, nb_channels)) - 0.5
+    estimates = references[:, :9000] + 0.1 * np.random.random(
+        (nb_sources, 9000, nb_channels)
+    )
+    paths = []
+    for name, signals in (("references", references), ("estimates", estimates)):
+        paths.append([])
+        for j, signal in enumerate(signals):
+            paths[-1].append(str(tmp_path / ("%s%d.wav" % (name, j))))
+            sf.write(paths[-1][-1], signal, 8000, subtype="FLOAT")
+
+    sources = museval.AudioSources(paths[1], length=10000)
+    assert sources.shape == (nb_sources, 10000, nb_channels)
+    assert np.allclose(sources[:, 8500:9500][:, :500], estimates[:, 8500:])
+    assert np.all(sources[:, 9000:] == 0)
+
+    expected = museval.evaluate(references, estimates, win=2000, hop=2000)
+    result = museval.evaluate(
+        museval.AudioSources(paths[0]),
+        sources,
+        win=2000,
+        hop=2000,
+        block_size=3000,
+    )
+    for a, b in zip(expected, result):
+        assert np.allclose(a, b, atol=1e-4)
+
+    mapped = museval.AudioSources(paths[1], length=10000, mmap=True)
+    assert all(isinstance(source, np.memmap) for source in mapped.sources)
+    assert np.array_equal(mapped[:, 2000:9500], sources[:, 2000:9500])
+
+
+def test_eval_dir_mmap(tmp_path):
+    for name in ("references", "estimates"):
+        (tmp_path / name).mkdir()
+        for target in ("vocals", "drums"):
+            sf.write(
+                str(tmp_path / name / (target + ".wav")),
+                np.random.random((20000, 2)) - 0.5,
+                8000,
+                subtype="FLOAT",
+            )
+    expected = museval.eval_dir(
+        str(tmp_path / "references"), str(tmp_path / "estimates"), win=0.5, hop=0.5
+    )
+    subset = museval.eval_dir(
+        str(tmp_path / "references"),
+        str(tmp_path / "estimates"),
+        win=0.5,
+        hop=0.5,
+        metrics=("SDR", "SIR"),
+    )
+    assert set(subset.df["metric"]) == {"SDR", "SIR"}
+    assert "ISR" not in repr(subset)
+
+    cheap = museval.eval_dir(
+        str(tmp_path / "references"),
+        str(tmp_path / "estimates"),
+        win=0.5,
+        hop=0.5,
+        metrics=("SDR", "SI-SDR", "SNR"),
+    )
+    assert set(cheap.df["metric"]) == {"SDR", "SI-SDR", "SNR"}
+    assert "SI-SDR" in repr(cheap)
+    cheap.validate()
+
+    stores = museval.eval_dir(
+        str(tmp_path / "references"),
+        str(tmp_path / "estimates"),
+        resolutions=[(0.5, 0.5), (np.inf, 1.0)],
+        metrics=("SDR", "SI-SDR"),
+    )
+    assert len(stores) == 2
+    assert np.allclose(
+        stores[0].df.query("metric == 'SDR'")["score"].values,
+        expected.df.query("metric == 'SDR'")["score"].values,
+    )
+    # a single frame over the whole track
+    assert len(stores[1].df) == 2 * 2
+    stores[1].validate()
+    for metric in ("SDR", "SIR"):
+        assert np.allclose(
+            expected.df.query("metric == @metric")["score"].values,
+            subset.df.query("metric == @metric")["score"].values,
+        )
+
+    for kwargs in (dict(mmap=True), dict(sidecar=True), dict(sidecar=True)):
+        result = museval.eval_dir(
+            str(tmp_path / "references"),
+            str(tmp_path / "estimates"),
+            win=0.5,
+            hop=0.5,
+            **kwargs
+        )
+        assert np.allclose(
+            expected.df["score"].values, result.df["score"].values, atol=1e-4
+        )
+
+
+def test_eval_mus_dir_jobs(tmp_path):
+    musdb = pytest.importorskip("musdb")
+    for root in ("references", "estimates"):
+        for name in ("A - a", "B - b", "C - c"):
+            track_dir = tmp_path / root / "test" / name
+            track_dir.mkdir(parents=True)
+            targets = ["vocals", "drums", "bass", "other"]
+            for target in targets + (["mixture"] if root == "references" else []):
+                # the estimates of the last track cannot be evaluated
+                nchan = 1 if root == "estimates" and name == "C - c" else 2
+                sf.write(
+                    str(track_dir / (target + ".wav")),
+                    np.random.random((8000, nchan)) - 0.5,
+                    8000,
+                )
+    dataset = musdb.DB(root=str(tmp_path / "references"), is_wav=True)
+
+    for n_jobs, prefetch, output_dir in (
+        (1, 0, "sequential"),
+        (1, 2, "pipelined"),
+        (2, 1, "parallel"),
+    ):
+        kwargs = dict(output_dir=str(tmp_path / output_dir), metrics=("SDR",))
+        with pytest.warns(UserWarning, match="C - c"):
+            museval.eval_mus_dir(
+                dataset,
+                str(tmp_path / "estimates"),
+                n_jobs=n_jobs,
+                prefetch=prefetch,
+                **kwargs
+            )
+    for output_dir in ("pipelined", "parallel"):
+        for name in ("A - a", "B - b"):
+            assert (tmp_path / output_dir / "test" / (name + ".json")).read_text() == (
+                tmp_path / "sequential" / "test" / (name + ".json")
+            ).read_text()
+    # the failed track is skipped by all the paths
+    for output_dir in ("sequential", "pipelined", "parallel"):
+        assert not (tmp_path / output_dir / "test" / "C - c.json").exists()
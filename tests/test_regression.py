@@ -79,7 +79,7 @@ def test_track_scores(reference):
             assert np.allclose(ref, est, atol=1e-01, equal_nan=True)
 
 
-def test_random_estimate(reference):
+def test_random_estimate(reference, tmp_path):
     track, _ = reference
     np.random.seed(0)
     random_voc = np.random.random(track.audio.shape)
@@ -91,7 +91,7 @@ def test_random_estimate(reference):
     scores = museval.eval_mus_track(track, estimates)
 
     # save json
-    with open(os.path.join(".", track.name) + ".json", "w+") as f:
+    with open(os.path.join(str(tmp_path), track.name) + ".json", "w+") as f:
         f.write(scores.json)
 
     # validate json
@@ -112,3 +112,42 @@ def test_one_estimate(reference):
     est_json = json.loads(est_scores.json)
 
     assert len(est_json["targets"]) == 0
+
+
+def test_shared_accompaniment(reference, monkeypatch):
+    track, _ = reference
+
+    np.random.seed(0)
+    estimates = {
+        target: np.random.random(track.audio.shape)
+        for target in ["vocals", "drums", "bass", "other", "accompaniment"]
+    }
+    calls = []
+    compute = museval.metrics._compute_reference_correlations
+
+    def spy(reference_sources, *args, **kwargs):
+        calls.append(len(reference_sources))
+        return compute(reference_sources, *args, **kwargs)
+
+    monkeypatch.setattr(museval.metrics, "_compute_reference_correlations", spy)
+    scores = museval.eval_mus_track(track, estimates)
+    # the voc/acc correlations are derived from the 4 stems ones
+    assert calls == [4]
+
+    # same scores as the separate evaluations of both scenarios
+    stems = museval.eval_mus_track(
+        track, {t: estimates[t] for t in ["vocals", "drums", "bass", "other"]}
+    )
+    pair = museval.eval_mus_track(
+        track, {t: estimates[t] for t in ["vocals", "accompaniment"]}
+    )
+    expected = {t["name"]: t for t in json.loads(stems.json)["targets"]}
+    expected.update({t["name"]: t for t in json.loads(pair.json)["targets"]})
+    for target in json.loads(scores.json)["targets"]:
+        for frame, expected_frame in zip(
+            target["frames"], expected[target["name"]]["frames"]
+        ):
+            for metric, value in frame["metrics"].items():
+                assert np.isclose(
+                    value, expected_frame["metrics"][metric], atol=1e-4, equal_nan=True
+                )
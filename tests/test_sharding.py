@@ -0,0 +1,74 @@
+import collections
+import random
+import pytest
+from museval import cli, sharding
+from museval.aggregate import TrackStore, EvalStore
+
+Track = collections.namedtuple("Track", ["name", "duration", "subset"])
+
+
+def track_store(name):
+    store = TrackStore(track_name=name)
+    store.add_target("vocals", {"SDR": [1.0, 2.0], "SIR": [3.0, 4.0]})
+    return store
+
+
+@pytest.mark.parametrize("count", [1, 3, 4])
+def test_shard_tracks(count):
+    tracks = [Track("track %d" % k, 100 + 37 * k % 200, "test") for k in range(50)]
+    shards = [sharding.shard_tracks(tracks, index, count) for index in range(count)]
+    # each track is in exactly one shard
+    names = sorted(t.name for shard in shards for t in shard)
+    assert names == sorted(t.name for t in tracks)
+    # whatever the order of the tracks
+    shuffled = random.sample(tracks, len(tracks))
+    for index, shard in enumerate(shards):
+        assert set(sharding.shard_tracks(shuffled, index, count)) == set(shard)
+    durations = [sum(t.duration for t in shard) for shard in shards]
+    assert max(durations) - min(durations) <= max(t.duration for t in tracks)
+    with pytest.raises(ValueError):
+        sharding.shard_tracks(tracks, count, count)
+
+
+def test_merge_eval_dirs(tmp_path):
+    for shard, names in enumerate((["A", "B"], ["C"])):
+        for name in names:
+            path = tmp_path / ("shard%d" % shard) / "test"
+            path.mkdir(parents=True, exist_ok=True)
+            (path / (name + ".json")).write_text(track_store(name).json)
+    inputs = [str(tmp_path / "shard0"), str(tmp_path / "shard1")]
+
+    cli.merge(inputs + ["-o", str(tmp_path / "merged")])
+    assert sorted(p.name for p in (tmp_path / "merged" / "test").iterdir()) == [
+        "A.json",
+        "B.json",
+        "C.json",
+    ]
+    with pytest.raises(ValueError):
+        sharding.merge_eval_dirs(inputs, str(tmp_path / "other"), ["A", "B", "D"])
+
+    (tmp_path / "shard1" / "test" / "A.json").write_text(track_store("A").json)
+    with pytest.raises(ValueError):
+        sharding.merge_eval_dirs(inputs, str(tmp_path / "other"))
+
+
+def test_merge_eval_stores(tmp_path):
+    paths = []
+    for shard, names in enumerate((["A", "B"], ["C"])):
+        store = EvalStore()
+        for name in names:
+            store.add_track(track_store(name))
+        paths.append(str(tmp_path / ("shard%d.pandas" % shard)))
+        store.save(paths[-1])
+
+    merged = sharding.merge_eval_stores(
+        paths, str(tmp_path / "merged.pandas"), tracks=["A", "B", "C"]
+    )
+    assert sorted(merged.df["track"].unique()) == ["A", "B", "C"]
+    reloaded = EvalStore()
+    reloaded.load(str(tmp_path / "merged.pandas"))
+    assert len(reloaded.df) == len(merged.df)
+    with pytest.raises(ValueError):
+        sharding.merge_eval_stores(paths + paths[1:])
+    with pytest.raises(ValueError):
+        sharding.merge_eval_stores(paths, tracks=["A", "D"])